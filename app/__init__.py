@@ -19,7 +19,9 @@ from flask_socketio import SocketIO  # noqa
 socketio = SocketIO(app,
                     logger=config.SOCKET_IO_LOGGER_ENABLED,
                     engineio_logger=config.SOCKET_IO_ENGINEIO_LOGGER_ENABLED,
-                    cors_allowed_origins=config.SOCKET_IO_CORS_ALLOWED_ORIGINS)
+                    cors_allowed_origins=config.SOCKET_IO_CORS_ALLOWED_ORIGINS,
+                    message_queue=app.config.get('SOCKET_IO_MESSAGE_QUEUE'),
+                    channel=app.config.get('SOCKET_IO_CHANNEL', 'flask-socketio'))
 
 # -------------------------------------------------------------------------
 # Session Configuration
@@ -90,6 +92,12 @@ logger = LogHelper(app)
 from app.helpers import CacheHelper  # noqa
 cache = CacheHelper(app)
 
+# flask-session does not know the sharded store, it is set up here once the
+# helpers can be imported
+if app.config.get('SESSION_TYPE') == 'sharded_filesystem':
+    from app.helpers.cache import ShardedFileSystemSessionInterface  # noqa
+    app.session_interface = ShardedFileSystemSessionInterface.from_config(app.config)
+
 # -------------------------------------------------------------------------
 # Campaign Configuration
 # -------------------------------------------------------------------------
@@ -9,12 +9,13 @@ export class CommentApiService extends ApiBase {
 		super(url || AppConfig.commentApiUrl);
 	}
 
-	getCommentsByPost(postId) {
+	getCommentsByPost(postId, page) {
 		const endpoint = `post/${postId}/items`;
 
 		return this.request({
 			url: endpoint,
-			method: 'GET'
+			method: 'GET',
+			params: { page: page || 1 }
 		});
 	}
 
@@ -20,6 +20,17 @@ export class StoryApiService extends ApiBase {
 		});
 	}
 
+	getItemsAfter(after, params) {
+		const endpoint = '/';
+		params = {...params, after: after || ''};
+
+		return this.request({
+			url: endpoint,
+			method: 'GET',
+			params: params
+		});
+	}
+
 	getItem(id) {
 		const endpoint = `/${ id }`;
 
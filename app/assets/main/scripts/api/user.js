@@ -26,4 +26,14 @@ export class UserApiService extends ApiBase {
 			method: 'GET'
 		});
 	}
+
+	getStoriesVotesState(ids) {
+		const endpoint = 'stories/votes/state';
+
+		return this.request({
+			url: endpoint,
+			method: 'GET',
+			params: { ids: ids.join(',') }
+		});
+	}
 }
@@ -5,8 +5,12 @@ import { CommentApiService } from 'Assets/main/scripts/api';
 export default {
 	namespaced: true,
 	state: {
+		postId: 0,
 		items: [],
 		itemsById: {},
+		// paging of the top-level comments
+		page: 0,
+		total: 0,
 		commentApiService: null
 	},
 	getters: {
@@ -34,7 +38,36 @@ export default {
 				});
 			}
 		},
+		appendItems(state, items) {
+			(items || []).forEach((comment) => {
+				state.items.push(comment);
+				traverseComments(comment);
+			});
+
+			function traverseComments(comment) {
+				state.itemsById[comment.id] = comment;
+
+				comment.children.forEach((c) => {
+					c.parent = comment;
+					traverseComments(c);
+				});
+			}
+		},
+		setPostId(state, postId) {
+			state.postId = postId;
+		},
+		setPage(state, { page, total }) {
+			state.page = page;
+			state.total = total;
+		},
 		addItem(state, comment) {
+			const existing = state.itemsById[comment.id];
+			if (existing) {
+				existing.text = comment.text;
+				existing.modified_at = comment.modified_at;
+				return;
+			}
+
 			const parentComment = comment.comment_id ? state.itemsById[comment.comment_id] : null;
 			if (parentComment) {
 				// append to children of parent comment
@@ -45,6 +78,7 @@ export default {
 			} else {
 				// append to root
 				state.items.push(comment);
+				state.total++;
 			}
 
 			state.itemsById[comment.id] = comment;
@@ -63,6 +97,7 @@ export default {
 				arr = parentComment.children;
 			} else {
 				arr = state.items;
+				state.total--;
 			}
 
 			for (let index = 0; index < arr.length; index++) {
@@ -76,11 +111,15 @@ export default {
 		}
 	},
 	actions: {
-		fetchCommentsByPost({ commit, getters, dispatch }, postId) {
+		fetchCommentsByPost({ commit, getters, dispatch }, { postId, page }) {
+			page = page || 1;
+
 			return new Promise((resolve, reject) => {
-				getters.commentApiService.getCommentsByPost(postId)
+				getters.commentApiService.getCommentsByPost(postId, page)
 					.then(data => {
-						commit('pushItems', data.comments);
+						commit('setPostId', postId);
+						commit(page > 1 ? 'appendItems' : 'pushItems', data.comments);
+						commit('setPage', { page: page, total: data.total });
 						resolve();
 					})
 					.catch(err => {
@@ -114,6 +153,26 @@ export default {
 						reject();
 					});
 			});
+		},
+		socket_storyCommentSaved({ commit, state }, payload) {
+			if (!payload.comment || payload.post_id != state.postId) {
+				return;
+			}
+
+			// replies to threads not loaded yet come with the thread
+			const parentId = payload.comment.comment_id;
+			if (parentId && !state.itemsById[parentId]) {
+				return;
+			}
+
+			commit('addItem', payload.comment);
+		},
+		socket_storyCommentDeleted({ commit, state }, payload) {
+			if (payload.post_id != state.postId) {
+				return;
+			}
+
+			commit('deleteItem', payload.id);
 		}
 	}
 };
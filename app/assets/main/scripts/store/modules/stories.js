@@ -3,10 +3,56 @@
 import { StoryApiService } from 'Assets/main/scripts/api';
 import $socket from 'Assets/main/scripts/config/socket';
 
+// rooms of the stories on screen, the changes are sent together once the
+// scrolling settles
+const rooms = {
+	joined: new Set(),
+	join: new Set(),
+	leave: new Set(),
+	timer: null
+};
+
+function syncRooms() {
+	rooms.timer = null;
+
+	if (!rooms.join.size && !rooms.leave.size) {
+		return;
+	}
+
+	$socket.emit('watch_stories', {
+		join: Array.from(rooms.join),
+		leave: Array.from(rooms.leave)
+	});
+
+	rooms.join.forEach(id => rooms.joined.add(id));
+	rooms.leave.forEach(id => rooms.joined.delete(id));
+	rooms.join.clear();
+	rooms.leave.clear();
+}
+
+function scheduleSyncRooms() {
+	if (!rooms.timer) {
+		rooms.timer = setTimeout(syncRooms, 250);
+	}
+}
+
+// the rooms are lost with the connection, join them again
+$socket.on('reconnect', () => {
+	rooms.joined.forEach(id => {
+		if (!rooms.leave.has(id)) {
+			rooms.join.add(id);
+		}
+	});
+	rooms.joined.clear();
+	rooms.leave.clear();
+	scheduleSyncRooms();
+});
+
 export default {
 	namespaced: true,
 	state: {
 		page: 1,
+		cursor: '',
 		items: [],
 		itemsById: {},
 		storyApiService: null
@@ -15,6 +61,9 @@ export default {
 		page: (state) => {
 			return state.page;
 		},
+		cursor: (state) => {
+			return state.cursor;
+		},
 		storyApiService: (state) => {
 			if (!state.storyApiService) {
 				state.storyApiService = new StoryApiService()
@@ -38,26 +87,46 @@ export default {
 		incrementPage(state) {
 			state.page++;
 		},
+		setCursor(state, cursor) {
+			state.cursor = cursor;
+		},
 		updateVoteCount(state, payload) {
 			const index = state.itemsById[payload.target_id];
 			if (isNaN(index) || !state.items || state.items.length < index) {
 				return;
 			}
-			state.items[index].likes = payload.count;
+
+			const item = state.items[index];
+
+			// the counts of several workers may arrive out of order
+			if (payload.version < item.votes_version) {
+				return;
+			}
+
+			item.likes = payload.count;
+			item.votes_version = payload.version;
 		}
 	},
 	actions: {
 		fetchItems({ commit, getters, dispatch }, params) {
 			return new Promise((resolve, reject) => {
-				getters.storyApiService.getItems(getters.page, params)
+				// the last page was already loaded
+				if (getters.cursor === null) {
+					resolve({ completed: true });
+					return;
+				}
+
+				getters.storyApiService.getItemsAfter(getters.cursor, params)
 					.then(data => {
-						if (!data.total || !data.stories || !data.stories.length) {
+						if (!data.stories || !data.stories.length) {
 							resolve({ completed: true });
 							return;
 						}
 
 						commit('pushItems', data.stories);
+						dispatch('user/fetchVotesState', data.stories.map(story => story.id), { root: true });
 						commit('incrementPage');
+						commit('setCursor', data.next || null);
 						resolve({ completed: false });
 					})
 					.catch(err => {
@@ -76,6 +145,7 @@ export default {
 						}
 
 						commit('pushItems', [data.story]);
+						dispatch('user/fetchVotesState', [data.story.id], { root: true });
 						resolve(data.story);
 					})
 					.catch(err => {
@@ -109,6 +179,22 @@ export default {
 					});
 			});
 		},
+		watch(_, id) {
+			if (rooms.leave.has(id)) {
+				rooms.leave.delete(id);
+			} else if (!rooms.joined.has(id)) {
+				rooms.join.add(id);
+			}
+			scheduleSyncRooms();
+		},
+		unwatch(_, id) {
+			if (rooms.join.has(id)) {
+				rooms.join.delete(id);
+			} else if (rooms.joined.has(id)) {
+				rooms.leave.add(id);
+			}
+			scheduleSyncRooms();
+		},
 		vote(_, targetId) {
 			$socket.emit('vote_story', {
 				target_id: targetId
@@ -121,6 +207,11 @@ export default {
 
 			commit('updateVoteCount', payload);
 			commit('user/refreshVote', payload, { root: true });
+		},
+		socket_voteStoryCounts({ commit }, payload) {
+			(payload.counts || []).forEach(item => {
+				commit('updateVoteCount', item);
+			});
 		}
 	}
 };
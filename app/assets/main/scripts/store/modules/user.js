@@ -2,6 +2,19 @@
 
 import { UserApiService, SessionApiService } from 'Assets/main/scripts/api';
 
+// limit of story ids of a vote state request
+const VOTES_STATE_MAX_IDS = 100;
+
+function setVote(votes, targetId, isUpvote) {
+	let index = votes.indexOf(targetId);
+
+	if (isUpvote && index < 0) {
+		votes.push(targetId);
+	} else if (!isUpvote && index >= 0) {
+		votes.splice(index, 1);
+	}
+}
+
 export default {
 	namespaced: true,
 	state: {
@@ -33,25 +46,19 @@ export default {
 			state.votes = votes;
 		},
 		refreshVote(state, payload) {
-			if (payload.is_upvote) {
-				state.votes.push(payload.target_id);
-				return;
-			}
-
-			let index = state.votes.indexOf(payload.target_id);
-
-			if (index < 0) {
-				return;
-			}
-
-			state.votes.splice(index, 1);
+			setVote(state.votes, payload.target_id, payload.is_upvote);
+		},
+		mergeVotes(state, votes) {
+			Object.keys(votes).forEach(key => {
+				setVote(state.votes, parseInt(key, 10), votes[key]);
+			});
 		},
 		clearVotes(state) {
 			state.votes = [];
 		}
 	},
 	actions: {
-		fetchProfile({ commit, getters, dispatch }) {
+		fetchProfile({ commit, getters, dispatch, rootState }) {
 			return new Promise((resolve, reject) => {
 				getters.userApiService.getProfile()
 					.then(response => {
@@ -61,7 +68,8 @@ export default {
 						}
 						commit('updateProfile', response.user);
 						if (response.user.is_authenticated) {
-							dispatch('fetchStoriesVotes');
+							// the stories loaded before the profile was known
+							dispatch('fetchVotesState', rootState.stories.items.map(item => item.id));
 						}
 						resolve();
 					})
@@ -71,19 +79,24 @@ export default {
 					});
 			});
 		},
-		fetchStoriesVotes({ commit, getters, dispatch }) {
-			return new Promise((resolve, reject) => {
-				getters.userApiService.getStoriesVotes()
+		fetchVotesState({ state, commit, getters, dispatch }, ids) {
+			if (!state.profile.is_authenticated || !ids || !ids.length) {
+				return Promise.resolve();
+			}
+
+			let requests = [];
+
+			for (let i = 0; i < ids.length; i += VOTES_STATE_MAX_IDS) {
+				requests.push(getters.userApiService.getStoriesVotesState(ids.slice(i, i + VOTES_STATE_MAX_IDS))
 					.then(response => {
-						let votes = response.votes || [];
-						commit('setVotes', votes);
-						resolve();
-					})
-					.catch(err => {
-						dispatch('notification/log', err, { root: true });
-						reject(err.response);
-					});
-			});
+						commit('mergeVotes', response.votes || {});
+					}));
+			}
+
+			return Promise.all(requests)
+				.catch(err => {
+					dispatch('notification/log', err, { root: true });
+				});
 		},
 		login({ getters, dispatch }, data) {
 			return new Promise((resolve, reject) => {
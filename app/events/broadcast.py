@@ -0,0 +1,87 @@
+# -*- coding: utf8 -*-
+
+import os
+import threading
+from app import socketio, app
+
+
+def story_room(story_id):
+    """Room of the sockets displaying the story, see `watch_stories`."""
+    return 'story.%s' % story_id
+
+
+def emit_story(event, story_id, data):
+    """Sends the event to the sockets displaying the story only."""
+    socketio.emit(event, data, room=story_room(story_id), namespace='/')
+
+
+class VoteBroadcaster(object):
+    """Coalesces the vote counts sent to the clients displaying the stories.
+
+    Instead of one `vote_story_results` message per vote, the latest count
+    and the sum of the deltas of each target are kept for `window` seconds
+    and sent as one `vote_story_counts` message to the room of the target.
+    A `window` of 0 sends every vote right away.
+
+    The votes of a story are counted by several workers whose messages
+    may arrive out of order, each count comes with the `votes_version` of
+    the post it was read with and the clients drop the older ones.
+    """
+    EVENT = 'vote_story_counts'
+
+    def __init__(self, window):
+        self.window = window
+        self._lock = threading.Lock()
+        self._pending = {}
+        self._flusher_pid = None
+
+    def add(self, target_id, count, delta, version):
+        with self._lock:
+            pending = self._pending.get(target_id)
+            latest = pending if pending and pending['version'] > version else {
+                'count': count,
+                'version': version
+            }
+            self._pending[target_id] = {
+                'target_id': target_id,
+                'count': latest['count'],
+                'version': latest['version'],
+                'delta': delta + (pending['delta'] if pending else 0)
+            }
+
+        if not self.window:
+            self.flush()
+            return
+
+        self._start_flusher()
+
+    def flush(self):
+        """Sends the pending counts, returns the number of targets sent."""
+        with self._lock:
+            pending, self._pending = self._pending, {}
+
+        for target_id, counts in pending.iteritems():
+            emit_story(self.EVENT, target_id, {'counts': [counts]})
+
+        return len(pending)
+
+    def _start_flusher(self):
+        # background tasks do not survive a fork, every worker starts its own
+        if self._flusher_pid == os.getpid():
+            return
+
+        self._flusher_pid = os.getpid()
+        socketio.start_background_task(self._run_flusher)
+
+    def _run_flusher(self):
+        while True:
+            socketio.sleep(self.window)
+
+            try:
+                self.flush()
+            except Exception as e:
+                app.logger.error(
+                    u'[SocketIO] error on flushing the vote counts, %s', e, exc_info=True)
+
+
+votes = VoteBroadcaster(app.config.get('SOCKET_IO_VOTES_WINDOW', 0.5))
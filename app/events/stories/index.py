@@ -2,8 +2,9 @@
 
 from app import socketio, app, cache
 from flask_login import current_user
-from app.models import Vote, Feed
-from flask_socketio import emit
+from app.models import Vote, Feed, Post
+from flask_socketio import emit, join_room, leave_room, rooms
+from app.events.broadcast import votes, story_room
 
 
 @socketio.on('vote_story', namespace='/')
@@ -18,22 +19,60 @@ def vote_post(message):
         if not user_id:
             raise ValueError('ERROR_INVALID_USER')
 
-        is_upvote, count = Vote.cast_vote(user_id,
-                                          target_id,
-                                          Vote.KIND_STORY)
+        is_upvote, count, delta = Vote.cast_vote(user_id,
+                                                 target_id,
+                                                 Vote.KIND_STORY)
         # clear related cache objects
-        Feed.clear_cached_posts()
+        Feed.invalidate_post(target_id)
+
+        # the post updated by the vote, its version orders the counts
+        version = Post.get_by_id(target_id).votes_version
 
         data = {
             'target_id': target_id,
             'user_id': user_id,
             'count': count,
+            'version': version,
             'is_upvote': is_upvote
         }
 
+        # the voter gets its own result, the others the coalesced counts
+        emit('vote_story_results', data)
 
-        emit('vote_story_results', data, broadcast=True)
+        if delta:
+            votes.add(target_id, count, delta, version)
 
     except Exception as e:
         app.logger.error(
             u'[SocketIO] error on "vote" event, %s', e, exc_info=True)
+
+
+@socketio.on('watch_stories', namespace='/')
+def watch_stories(message):
+    """Joins the rooms of the stories the client displays and leaves the
+    ones it scrolled away from, both given as lists of ids."""
+    try:
+        joined = set(room for room in rooms() if room.startswith('story.'))
+
+        for story_id in message.get('leave') or []:
+            room = story_room(int(story_id))
+
+            if room in joined:
+                leave_room(room)
+                joined.discard(room)
+
+        for story_id in message.get('join') or []:
+            room = story_room(int(story_id))
+
+            if room in joined:
+                continue
+
+            if len(joined) >= app.config.get('SOCKET_IO_MAX_STORY_ROOMS', 100):
+                break
+
+            join_room(room)
+            joined.add(room)
+
+    except Exception as e:
+        app.logger.error(
+            u'[SocketIO] error on "watch_stories" event, %s', e, exc_info=True)
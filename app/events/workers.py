@@ -0,0 +1,35 @@
+# -*- coding: utf8 -*-
+
+import os
+import subprocess
+import sys
+from app import app
+
+# the worker entry point patches gevent before it imports the app, which a
+# process forked from this one could not do anymore
+WORKER_SCRIPT = os.path.join(os.path.dirname(app.root_path), 'socketio_worker.py')
+
+# kombu transports whose messages never leave the process
+IN_PROCESS_QUEUES = ('memory',)
+
+
+def start_workers(count, host='0.0.0.0', port=5000):
+    """Starts `count` Socket.IO processes listening on `port`, `port + 1`...
+
+    The workers relay their events to each other through
+    SOCKET_IO_MESSAGE_QUEUE. A client can connect to any of them, as long as
+    the load balancer keeps all the requests of its session on one worker.
+    """
+    queue = app.config.get('SOCKET_IO_MESSAGE_QUEUE') or ''
+
+    if count > 1 and not queue:
+        raise ValueError('SOCKET_IO_MESSAGE_QUEUE is required to run several workers')
+
+    if count > 1 and queue.split('://')[0] in IN_PROCESS_QUEUES:
+        raise ValueError('SOCKET_IO_MESSAGE_QUEUE %s stays inside one process, the workers '
+                         'would not relay their events to each other, use the Rabbit MQ '
+                         'BROKER_URL' % queue)
+
+    return [subprocess.Popen([sys.executable, WORKER_SCRIPT, str(port + i), host],
+                             cwd=os.path.dirname(WORKER_SCRIPT))
+            for i in range(count)]
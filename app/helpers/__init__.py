@@ -2,10 +2,10 @@
 
 from .cache import CacheHelper
 from .campaign import CampaignHelper
-from .database import ModelHelper, MutableObject
-from .html import render_view, nocache
+from .database import ModelHelper, MutableObject, BatchLoader
+from .html import render_view, nocache, conditional
 from .pagination import PaginationHelper
-from .json import HttpJsonEncoder, DatabaseJSONEncoder, render_json, render_json_template, is_json_request
+from .json import HttpJsonEncoder, DatabaseJSONEncoder, render_json, render_json_stream, render_json_template, is_json_request, serialize, encode_ids
 from .log import LogHelper
 from .picture import process_image_file
 from .email import send_email
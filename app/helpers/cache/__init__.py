@@ -1,3 +1,5 @@
 # -*- coding: utf8 -*-
 from .helper import CacheHelper
+from .filesystem import ShardedFileSystemCache, ShardedFileSystemSessionInterface
+from . import tasks  # noqa
 
@@ -0,0 +1,287 @@
+# -*- coding: utf8 -*-
+
+from flask_caching.backends.base import BaseCache
+from flask_session.sessions import FileSystemSessionInterface
+import cPickle as pickle
+import errno
+import fcntl
+import hashlib
+import mmap
+import os
+import struct
+import tempfile
+import time
+
+
+class ShardedFileSystemCache(BaseCache):
+    """Filesystem cache spreading its entries over hashed sub-directories.
+
+    The md5 of the key names the file and its first bytes the directories
+    (`ab/cd/abcd...`), so no directory grows past a few thousand entries.
+    Entries are written to a temporary file and renamed in place, readers
+    never see a partial entry. Entries bigger than `mmap_threshold` are
+    read through mmap instead of the buffered file.
+
+    Nothing is pruned on write: `python command.py cache evict`, a process
+    of its own, removes the expired entries, the ones older than `max_age`
+    and then the least recently written until the cache is under
+    `max_size` bytes. A lock file makes a single process of the host run
+    the eviction.
+    """
+    _tmp_suffix = '.tmp'
+    _lock_file = '.evict.lock'
+
+    # expiration timestamp in front of the pickled value
+    _header = struct.Struct('!d')
+
+    def __init__(self, cache_dir, default_timeout=300, max_size=0, max_age=0,
+                 mmap_threshold=65536, mode=0o600):
+        super(ShardedFileSystemCache, self).__init__(default_timeout)
+        self._path = cache_dir
+        self._max_size = max_size
+        self._max_age = max_age
+        self._mmap_threshold = mmap_threshold
+        self._mode = mode
+
+        self._makedirs(self._path)
+
+    def get(self, key):
+        filename = self._filename(key)
+
+        try:
+            with open(filename, 'rb') as f:
+                expires_at = self._header.unpack(f.read(self._header.size))[0]
+
+                if expires_at and expires_at < time.time():
+                    self._remove(filename)
+                    return None
+
+                return self._load(f)
+        except (IOError, OSError, EOFError, struct.error, pickle.PickleError):
+            return None
+
+    def set(self, key, value, timeout=None):
+        filename = self._filename(key)
+
+        try:
+            tmp = self._write(filename, value, timeout)
+            os.rename(tmp, filename)
+        except (IOError, OSError):
+            return False
+
+        return True
+
+    def add(self, key, value, timeout=None):
+        """Stores the value unless the key exists, atomically.
+
+        The entry is written aside and hard linked in place, the link fails
+        when another process created the key first.
+        """
+        filename = self._filename(key)
+
+        try:
+            tmp = self._write(filename, value, timeout)
+        except (IOError, OSError):
+            return False
+
+        try:
+            for retry in (True, False):
+                try:
+                    os.link(tmp, filename)
+                    return True
+                except OSError as e:
+                    if e.errno != errno.EEXIST or not retry or self.has(key):
+                        return False
+                    # the existing entry had expired and was removed by has
+        finally:
+            self._remove(tmp)
+
+    def delete(self, key):
+        return self._remove(self._filename(key))
+
+    def has(self, key):
+        filename = self._filename(key)
+
+        try:
+            with open(filename, 'rb') as f:
+                expires_at = self._header.unpack(f.read(self._header.size))[0]
+        except (IOError, OSError, struct.error):
+            return False
+
+        if expires_at and expires_at < time.time():
+            self._remove(filename)
+            return False
+
+        return True
+
+    def clear(self):
+        for filename, stat in self._entries():
+            self._remove(filename)
+        return True
+
+    def evict(self):
+        """Removes the expired and old entries, then the least recently
+        written ones while the cache is bigger than `max_size`.
+
+        Returns the number of entries removed.
+        """
+        now = time.time()
+        removed = 0
+        entries = []
+
+        for filename, stat in self._entries():
+            is_old = self._max_age and stat.st_mtime < now - self._max_age
+            is_tmp = filename.endswith(self._tmp_suffix)
+
+            # temporary files are left alone for a while, they may be in use
+            if is_tmp and stat.st_mtime > now - 3600:
+                continue
+
+            if is_old or is_tmp or self._is_expired(filename, now):
+                removed += self._remove(filename)
+            else:
+                entries.append((stat.st_mtime, stat.st_size, filename))
+
+        if self._max_size:
+            size = sum(entry[1] for entry in entries)
+
+            # leave some room to not evict again on the next write
+            for mtime, file_size, filename in sorted(entries):
+                if size <= self._max_size * 0.9:
+                    break
+                if self._remove(filename):
+                    removed += 1
+                    size -= file_size
+
+        return removed
+
+    def evict_exclusive(self):
+        """Runs `evict` unless another process of the host is evicting.
+
+        Returns the number of entries removed, None when it was skipped.
+        """
+        with open(os.path.join(self._path, self._lock_file), 'a') as lock:
+            try:
+                fcntl.flock(lock, fcntl.LOCK_EX | fcntl.LOCK_NB)
+            except IOError:
+                return None
+
+            try:
+                return self.evict()
+            finally:
+                fcntl.flock(lock, fcntl.LOCK_UN)
+
+    def _entries(self):
+        for root, dirs, files in os.walk(self._path):
+            for name in files:
+                if name == self._lock_file:
+                    continue
+
+                filename = os.path.join(root, name)
+
+                try:
+                    yield filename, os.stat(filename)
+                except OSError:
+                    pass
+
+    def _filename(self, key):
+        if isinstance(key, unicode):
+            key = key.encode('utf-8')
+
+        digest = hashlib.md5(key).hexdigest()
+        return os.path.join(self._path, digest[0:2], digest[2:4], digest)
+
+    def _write(self, filename, value, timeout):
+        """Writes the entry next to `filename`, returns the temporary path."""
+        timeout = self._normalize_timeout(timeout)
+        expires_at = time.time() + timeout if timeout else 0
+        directory = os.path.dirname(filename)
+
+        self._makedirs(directory)
+
+        fd, tmp = tempfile.mkstemp(suffix=self._tmp_suffix, dir=directory)
+
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(self._header.pack(expires_at))
+                pickle.dump(value, f, pickle.HIGHEST_PROTOCOL)
+            os.chmod(tmp, self._mode)
+        except (IOError, OSError):
+            self._remove(tmp)
+            raise
+
+        return tmp
+
+    def _load(self, f):
+        size = os.fstat(f.fileno()).st_size
+
+        if size < self._mmap_threshold:
+            return pickle.load(f)
+
+        data = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            data.seek(self._header.size)
+            return pickle.load(data)
+        finally:
+            data.close()
+
+    def _is_expired(self, filename, now):
+        try:
+            with open(filename, 'rb') as f:
+                expires_at = self._header.unpack(f.read(self._header.size))[0]
+        except (IOError, OSError, struct.error):
+            return True
+        return bool(expires_at) and expires_at < now
+
+    @staticmethod
+    def _remove(filename):
+        try:
+            os.remove(filename)
+        except OSError:
+            return False
+        return True
+
+    @staticmethod
+    def _makedirs(path):
+        try:
+            os.makedirs(path)
+        except OSError as e:
+            if e.errno != errno.EEXIST:
+                raise
+
+
+def sharded_filesystem(app, config, args, kwargs):
+    """Flask-Caching factory, set CACHE_TYPE to this function's path."""
+    kwargs.update(dict(
+        max_size=config.get('CACHE_MAX_SIZE', 0),
+        max_age=config.get('CACHE_MAX_AGE', 0),
+        mmap_threshold=config.get('CACHE_MMAP_THRESHOLD', 65536)
+    ))
+    return ShardedFileSystemCache(config['CACHE_DIR'], *args, **kwargs)
+
+
+class ShardedFileSystemSessionInterface(FileSystemSessionInterface):
+    """Flask-Session interface storing the sessions in a sharded cache.
+
+    Sessions expire with `PERMANENT_SESSION_LIFETIME` and are removed by
+    the eviction of the cache instead of the threshold scan of the
+    filesystem sessions.
+    """
+
+    def __init__(self, cache_dir, max_size, mode, key_prefix,
+                 use_signer=False, permanent=True):
+        self.cache = ShardedFileSystemCache(cache_dir,
+                                            max_size=max_size,
+                                            mode=mode)
+        self.key_prefix = key_prefix
+        self.use_signer = use_signer
+        self.permanent = permanent
+
+    @classmethod
+    def from_config(cls, config):
+        return cls(config['SESSION_FILE_DIR'],
+                   config.get('SESSION_FILE_MAX_SIZE', 0),
+                   config.get('SESSION_FILE_MODE', 0o600),
+                   config['SESSION_KEY_PREFIX'],
+                   config.get('SESSION_USE_SIGNER', False),
+                   config.get('SESSION_PERMANENT', True))
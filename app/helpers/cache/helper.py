@@ -1,13 +1,44 @@
 # -*- coding: utf8 -*-
 
+from flask import request, session, g, make_response, current_app
+from flask_babel import get_locale
 from flask_caching import Cache
+from flask_login import current_user
+from flask_wtf.csrf import generate_csrf
 from flask_caching import make_template_fragment_key
+from .local import LocalCache
+from .stats import CacheStats
+import cPickle as pickle
+import functools
+import hashlib
+import os
+import socket
+import time
+import zlib
+
+
+class CompressedValue(object):
+    """Cached value stored as a zlib compressed pickle."""
+
+    def __init__(self, data):
+        self.data = data
 
 
 class CacheHelper(Cache):
 
     _cache_enabled = False
 
+    NAMESPACE_PREFIX = 'ns'
+    LOCK_PREFIX = 'lock'
+    LOCK_TIMEOUT = 30
+    LOCK_WAIT = 2
+    # namespace of the widget fragments kept by get_tiered
+    WIDGETS_NAMESPACE = 'widgets'
+    # key prefix of the stats published by each process
+    STATS_PREFIX = 'cache-stats'
+    # stands for the csrf token of the visitor in the cached pages
+    CSRF_PLACEHOLDER = '__page_cache_csrf_token__'
+
     def __init__(self, app, **kwargs):
 
         if app is None:
@@ -20,6 +51,27 @@ class CacheHelper(Cache):
         if not self._cache_enabled:
             config['CACHE_TYPE'] = 'null'
 
+        # hits, misses and latencies by key prefix, see cache_stats
+        self.stats = CacheStats() if app.config.get('CACHE_STATS_ENABLED', False) else None
+        self._stats_interval = app.config.get('CACHE_STATS_INTERVAL', 60)
+        self._stats_published_at = time.time()
+
+        # full responses of the anonymous pages, see cached_page
+        self._page_cache_enabled = app.config.get('PAGE_CACHE_ENABLED', False)
+        self._page_cache_timeout = app.config.get('PAGE_CACHE_TIMEOUT', 300)
+
+        # in-process tier in front of the shared backend, see get_tiered
+        self.local = LocalCache(size=app.config.get('CACHE_LOCAL_SIZE', 1024),
+                                timeout=app.config.get('CACHE_LOCAL_TIMEOUT', 60),
+                                on_evict=self._on_local_evict)
+        self._local_generation_timeout = app.config.get('CACHE_LOCAL_GENERATION_TIMEOUT', 5)
+        # values bigger than this many bytes once pickled are compressed, 0 disables it
+        self._compress_threshold = app.config.get('CACHE_COMPRESS_THRESHOLD', 0)
+        self._tier_stats = {
+            'l1': {'hits': 0, 'misses': 0},
+            'l2': {'hits': 0, 'misses': 0}
+        }
+
         super(CacheHelper, self).__init__(app=app,
                                           config=config,
                                           **kwargs)
@@ -28,30 +80,472 @@ class CacheHelper(Cache):
         key = make_template_fragment_key(name, vary_on=vary_on or [])
         return self.get(key)
 
-    def get(self, *args, **kwargs):
+    @property
+    def enabled(self):
+        return self._cache_enabled
+
+    def get(self, key):
         # only when cache is enabled via config
         if not self._cache_enabled:
             return None
 
-        return super(CacheHelper, self).get(*args, **kwargs)
+        started_at = time.time()
+        value = super(CacheHelper, self).get(key)
+        self._record([key], started_at, [value])
+
+        return self._decompress(value)
 
-    def set(self, *args, **kwargs):
+    def set(self, key, value, timeout=None):
         # only when cache is enabled via config
         if not self._cache_enabled:
             return None
 
-        return super(CacheHelper, self).set(*args, **kwargs)
+        value, size = self._compress(value)
 
-    def add(self, *args, **kwargs):
+        started_at = time.time()
+        result = super(CacheHelper, self).set(key, value, timeout=timeout)
+        self._record([key], started_at, sets=1, bytes=size)
+
+        return result
+
+    def add(self, key, value, timeout=None):
         # only when cache is enabled via config
         if not self._cache_enabled:
             return None
 
-        return super(CacheHelper, self).add(*args, **kwargs)
+        value, size = self._compress(value)
+
+        started_at = time.time()
+        result = super(CacheHelper, self).add(key, value, timeout=timeout)
+        self._record([key], started_at, sets=1, bytes=size if result else 0)
 
-    def delete(self, *args, **kwargs):
+        return result
+
+    def delete(self, key):
         """Proxy function for internal cache object."""
         if not self._cache_enabled:
             return None
 
-        return super(CacheHelper, self).delete(*args, **kwargs)
+        started_at = time.time()
+        result = super(CacheHelper, self).delete(key)
+        self._record([key], started_at, deletes=1)
+
+        return result
+
+    def get_many(self, *keys):
+        """Values of the keys in a single backend call, None for the missing ones."""
+        if not self._cache_enabled:
+            return [None] * len(keys)
+
+        started_at = time.time()
+        values = super(CacheHelper, self).get_many(*keys)
+        self._record(keys, started_at, values)
+
+        return [self._decompress(value) for value in values]
+
+    def set_many(self, mapping, timeout=None):
+        if not self._cache_enabled:
+            return None
+
+        encoded = dict((key, self._compress(value)) for key, value in mapping.iteritems())
+
+        started_at = time.time()
+        result = super(CacheHelper, self).set_many(
+            dict((key, value) for key, (value, size) in encoded.iteritems()),
+            timeout=timeout)
+
+        if self.stats is not None:
+            for key, (value, size) in encoded.iteritems():
+                self.stats.record(key, sets=1, bytes=size)
+        self._record(encoded.keys(), started_at)
+
+        return result
+
+    def delete_many(self, *keys):
+        if not self._cache_enabled:
+            return None
+
+        started_at = time.time()
+        result = super(CacheHelper, self).delete_many(*keys)
+        self._record(keys, started_at, deletes=1)
+
+        return result
+
+    def inc(self, key, delta=1):
+        """Increments the value of the key, atomic on backends supporting it."""
+        if not self._cache_enabled:
+            return None
+
+        return self.cache.inc(key, delta=delta)
+
+    def namespaced_key(self, namespace, key):
+        """Key living under the current generation of the namespace.
+
+        Bumping the namespace changes the generation, every key created
+        before is then unreachable and left to expire.
+        """
+        return u'%s.%s/%s' % (namespace, self.namespace_generation(namespace), key)
+
+    def namespace_generation(self, namespace):
+        return self.namespace_generations([namespace]).get(namespace)
+
+    def namespace_generations(self, namespaces):
+        """Current generation of each namespace, starting the missing ones."""
+        if not self._cache_enabled or not namespaces:
+            return {}
+
+        namespaces = list(namespaces)
+        keys = [self._namespace_key(ns) for ns in namespaces]
+        generations = dict(zip(namespaces, self.cache.get_many(*keys)))
+
+        for namespace, generation in generations.iteritems():
+            if generation is None:
+                key = self._namespace_key(namespace)
+                # add() keeps the value of a concurrent start
+                self.cache.add(key, self._new_generation(), timeout=0)
+                generations[namespace] = self.cache.get(key)
+
+        return generations
+
+    def bump_namespace(self, namespace):
+        """Invalidates every key of the namespace in O(1)."""
+        if not self._cache_enabled:
+            return None
+
+        key = self._namespace_key(namespace)
+
+        # an evicted counter restarts from the clock instead of from 1
+        if self.cache.get(key) is None or self.cache.inc(key) is None:
+            self.cache.set(key, self._new_generation(), timeout=0)
+
+        self.local.delete(key)
+
+    def get_tiered(self, key, namespace=None):
+        """Reads the key from the in-process cache, then from the backend.
+
+        With a namespace the entries follow its generation: bumping it
+        invalidates the backend right away and the in-process copies of
+        other processes once they refresh the generation, which they keep
+        for CACHE_LOCAL_GENERATION_TIMEOUT seconds.
+        """
+        if not self._cache_enabled:
+            return None
+
+        generation = self._local_generation(namespace)
+        entry = self.local.get(key)
+
+        if entry is not None and entry[1] == generation:
+            self._count('l1', 'hits')
+            return entry[0]
+
+        self._count('l1', 'misses')
+
+        value = self.get(self._tiered_key(key, namespace, generation))
+
+        self._count('l2', 'misses' if value is None else 'hits')
+
+        if value is not None:
+            self.local.set(key, (value, generation))
+
+        return value
+
+    def set_tiered(self, key, value, timeout=None, namespace=None):
+        if not self._cache_enabled:
+            return None
+
+        generation = self._local_generation(namespace)
+
+        self.local.set(key, (value, generation),
+                       min(timeout or self.local.timeout, self.local.timeout))
+
+        return self.set(self._tiered_key(key, namespace, generation), value, timeout)
+
+    def tier_stats(self):
+        """Hits and misses of each tier of get_tiered in this process."""
+        return dict((tier, dict(stats)) for tier, stats in self._tier_stats.iteritems())
+
+    def _local_generation(self, namespace):
+        if not namespace:
+            return None
+
+        key = self._namespace_key(namespace)
+        generation = self.local.get(key)
+
+        if generation is None:
+            generation = self.namespace_generation(namespace)
+            self.local.set(key, generation, self._local_generation_timeout)
+
+        return generation
+
+    def _tiered_key(self, key, namespace, generation):
+        if not namespace:
+            return key
+        return u'%s.%s/%s' % (namespace, generation, key)
+
+    def _count(self, tier, name):
+        self._tier_stats[tier][name] += 1
+
+    def cache_stats(self):
+        """Stats of the processes which published them recently, merged.
+
+        Every process keeps its own counters and publishes them into the
+        cache every CACHE_STATS_INTERVAL seconds.
+        """
+        if self.stats is None or not self._cache_enabled:
+            return None
+
+        self._publish_stats(force=True)
+
+        processes = self.cache.get(self._stats_key('processes')) or []
+        snapshots = [s for s in self.cache.get_many(*processes) if s] if processes else []
+
+        tiers = {}
+        for snapshot in snapshots:
+            for tier, counters in snapshot['tiers'].iteritems():
+                for name, value in counters.iteritems():
+                    tiers.setdefault(tier, {}).setdefault(name, 0)
+                    tiers[tier][name] += value
+
+        return {
+            'processes': len(snapshots),
+            'prefixes': CacheStats.report(CacheStats.merge([s['prefixes'] for s in snapshots])),
+            'tiers': tiers
+        }
+
+    def _record(self, keys, started_at, values=None, **counters):
+        """Records a backend call on `keys`, hits and misses from `values`."""
+        if self.stats is None:
+            return
+
+        seconds = time.time() - started_at
+        timed = set()
+
+        for i, key in enumerate(keys):
+            if values is not None:
+                hit = values[i] is not None
+                counters = dict(hits=int(hit), misses=int(not hit))
+
+            # the latency of the call is counted once per prefix
+            prefix = CacheStats.prefix(key)
+            self.stats.record(key, seconds if prefix not in timed else None, **counters)
+            timed.add(prefix)
+
+        self._publish_stats()
+
+    def _on_local_evict(self, key):
+        if self.stats is not None:
+            self.stats.record(key, evictions=1)
+
+    def _publish_stats(self, force=False):
+        if not force and time.time() - self._stats_published_at < self._stats_interval:
+            return
+
+        self._stats_published_at = time.time()
+
+        key = self._stats_key(u'%s.%s' % (socket.gethostname(), os.getpid()))
+        processes_key = self._stats_key('processes')
+
+        try:
+            self.cache.set(key,
+                           {'prefixes': self.stats.snapshot(), 'tiers': self.tier_stats()},
+                           timeout=self._stats_interval * 10)
+
+            # forget the processes whose stats expired
+            processes = self.cache.get(processes_key) or []
+            alive = self.cache.get_many(*processes) if processes else []
+            processes = [p for p, stats in zip(processes, alive) if stats and p != key]
+
+            self.cache.set(processes_key, processes + [key], timeout=0)
+        except Exception as e:
+            # stats are never worth failing the request
+            self.app.logger.error(u'[CacheHelper] error publishing stats, %s', e, exc_info=True)
+
+    def _stats_key(self, name):
+        return u'%s/%s' % (self.STATS_PREFIX, name)
+
+    def _compress(self, value):
+        """Value to store and its size in bytes, when it was measured.
+
+        Values are only pickled here to be compressed, otherwise the size is
+        the length of the strings and 0 for the rest, the backend pickles
+        them again anyway.
+        """
+        if value is None:
+            return value, 0
+
+        if not self._compress_threshold:
+            return value, len(value) if isinstance(value, basestring) else 0
+
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+
+        if len(data) < self._compress_threshold:
+            return value, len(data)
+
+        data = zlib.compress(data)
+        return CompressedValue(data), len(data)
+
+    def _decompress(self, value):
+        if isinstance(value, CompressedValue):
+            return pickle.loads(zlib.decompress(value.data))
+        return value
+
+    def _namespace_key(self, namespace):
+        return u'%s/%s' % (self.NAMESPACE_PREFIX, namespace)
+
+    def _new_generation(self):
+        # time based, an evicted counter never restarts on an old generation
+        return int(time.time() * 1000)
+
+    def lock(self, key, timeout=LOCK_TIMEOUT):
+        """Takes the lock of the key, False when another worker holds it."""
+        if not self._cache_enabled:
+            return True
+
+        return bool(self.cache.add(self._lock_key(key), time.time(), timeout=timeout))
+
+    def unlock(self, key):
+        if not self._cache_enabled:
+            return None
+
+        self.cache.delete(self._lock_key(key))
+
+    def wait_for(self, key, timeout=LOCK_WAIT, interval=0.05):
+        """Waits for the value of a key computed by the holder of its lock."""
+        deadline = time.time() + timeout
+
+        while time.time() < deadline:
+            value = self.get(key)
+            if value is not None:
+                return value
+            if self.cache.get(self._lock_key(key)) is None:
+                return None
+            time.sleep(interval)
+
+        return None
+
+    def cached_swr(self, soft_timeout=300, hard_timeout=3600, key_prefix='swr',
+                   refresh_async=False):
+        """Caches a view with stale-while-revalidate and single-flight.
+
+        Values are fresh for `soft_timeout` seconds and kept for
+        `hard_timeout`. A stale value is served while a single worker,
+        holding the lock of the key, recomputes it (or a celery task when
+        `refresh_async` is set). On a miss only the lock holder computes
+        the view, the other requests wait for its value.
+        """
+        def decorator(f):
+            @functools.wraps(f)
+            def decorated_function(*args, **kwargs):
+                if not self._cache_enabled:
+                    return f(*args, **kwargs)
+
+                key = self._view_key(key_prefix)
+
+                def refresh():
+                    try:
+                        value = f(*args, **kwargs)
+                        self.set(key, (value, time.time() + soft_timeout), hard_timeout)
+                        return value
+                    finally:
+                        self.unlock(key)
+
+                # celery task recomputing a stale value
+                if getattr(g, '_cache_swr_refresh', False):
+                    return refresh()
+
+                cached = self.get(key)
+
+                if cached is not None:
+                    value, fresh_until = cached
+
+                    if time.time() < fresh_until or not self.lock(key):
+                        return value
+
+                    if refresh_async:
+                        from .tasks import refresh_cached_view
+                        refresh_cached_view.delay(request.endpoint,
+                                                  request.path,
+                                                  request.query_string,
+                                                  request.view_args)
+                        return value
+
+                    return refresh()
+
+                if self.lock(key):
+                    return refresh()
+
+                cached = self.wait_for(key)
+
+                if cached is not None:
+                    return cached[0]
+
+                return f(*args, **kwargs)
+
+            return decorated_function
+        return decorator
+
+    def cached_page(self, version=None, timeout=None, key_prefix='page'):
+        """Caches the full html response of a page for anonymous visitors.
+
+        Pages are keyed by host, path, locale and the stamp returned by
+        `version` (called with the view arguments), so a new stamp makes
+        the page be rendered again; when it returns None the page is not
+        cached. Logged in visitors and requests with flashed messages
+        always render the page. The csrf token is cached as a placeholder
+        and replaced by the token of the visitor.
+        """
+        def decorator(f):
+            @functools.wraps(f)
+            def decorated_function(*args, **kwargs):
+                if not self._is_page_cacheable():
+                    return f(*args, **kwargs)
+
+                stamp = version(**kwargs) if version else ()
+
+                if stamp is None:
+                    return f(*args, **kwargs)
+
+                key = self._page_key(key_prefix, stamp)
+                cached = self.get(key)
+
+                if cached is not None:
+                    return self._page_response(cached)
+
+                response = make_response(f(*args, **kwargs))
+
+                if response.status_code == 200 and response.mimetype == 'text/html':
+                    body = response.get_data(as_text=True)
+                    self.set(key,
+                             body.replace(generate_csrf(), self.CSRF_PLACEHOLDER),
+                             timeout or self._page_cache_timeout)
+                    response.headers['X-Page-Cache'] = 'MISS'
+
+                return response
+
+            return decorated_function
+        return decorator
+
+    def _is_page_cacheable(self):
+        return (self._page_cache_enabled and
+                self._cache_enabled and
+                request.method == 'GET' and
+                not current_user.is_authenticated and
+                '_flashes' not in session)
+
+    def _page_key(self, key_prefix, stamp):
+        values = repr((request.host, request.full_path, str(get_locale()), stamp))
+        return u'%s/%s' % (key_prefix, hashlib.sha1(values).hexdigest())
+
+    def _page_response(self, body):
+        response = current_app.response_class(
+            body.replace(self.CSRF_PLACEHOLDER, generate_csrf()),
+            mimetype='text/html')
+        response.headers['X-Page-Cache'] = 'HIT'
+        return response
+
+    def _view_key(self, key_prefix):
+        args = str(sorted(request.args.items(multi=True)))
+        return u'%s/%s%s' % (key_prefix, request.path, hashlib.md5(args).hexdigest())
+
+    def _lock_key(self, key):
+        return u'%s/%s' % (self.LOCK_PREFIX, key)
@@ -0,0 +1,59 @@
+# -*- coding: utf8 -*-
+
+from collections import OrderedDict
+import threading
+import time
+
+
+class LocalCache(object):
+    """Bounded in-process LRU cache with a timeout per entry."""
+
+    def __init__(self, size=1024, timeout=60, on_evict=None):
+        self.size = size
+        self.timeout = timeout
+        # called with the key of the entries dropped to make room
+        self.on_evict = on_evict
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.pop(key, None)
+
+            if entry is None:
+                return None
+
+            value, expires_at = entry
+
+            if expires_at < time.time():
+                return None
+
+            # re-insert it as the most recently used entry
+            self._entries[key] = entry
+            return value
+
+    def set(self, key, value, timeout=None):
+        expires_at = time.time() + (timeout or self.timeout)
+
+        with self._lock:
+            self._entries.pop(key, None)
+            self._entries[key] = (value, expires_at)
+
+            evicted = []
+            while len(self._entries) > self.size:
+                evicted.append(self._entries.popitem(last=False)[0])
+
+        if self.on_evict is not None:
+            for key in evicted:
+                self.on_evict(key)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def __len__(self):
+        return len(self._entries)
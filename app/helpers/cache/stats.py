@@ -0,0 +1,95 @@
+# -*- coding: utf8 -*-
+
+import bisect
+import re
+import threading
+
+
+class CacheStats(object):
+    """Counters and latency histograms of the cache calls, by key prefix.
+
+    The prefix of a key is its first one or two path segments, before the
+    first dot: `stamps/feed.<id>` is counted under `stamps/feed` and
+    `lp_home.en` under `lp_home`.
+    """
+    # upper bounds of the latency buckets, in milliseconds
+    LATENCY_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+    COUNTERS = ('hits', 'misses', 'sets', 'deletes', 'evictions', 'bytes', 'calls')
+
+    _PREFIX_RE = re.compile(r'^[^./]*(/[^./]*)?')
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._prefixes = {}
+
+    @classmethod
+    def prefix(cls, key):
+        return cls._PREFIX_RE.match(key or '').group(0) or '-'
+
+    def record(self, key, seconds=None, **counters):
+        prefix = self.prefix(key)
+
+        with self._lock:
+            stats = self._prefixes.get(prefix)
+
+            if stats is None:
+                stats = self._prefixes[prefix] = self._empty()
+
+            for name, value in counters.iteritems():
+                stats[name] += value
+
+            if seconds is not None:
+                ms = seconds * 1000.0
+                stats['calls'] += 1
+                stats['ms'] += ms
+                stats['latency'][bisect.bisect_left(self.LATENCY_BUCKETS, ms)] += 1
+
+    def snapshot(self):
+        with self._lock:
+            return dict((prefix, dict(stats, latency=list(stats['latency'])))
+                        for prefix, stats in self._prefixes.iteritems())
+
+    def reset(self):
+        with self._lock:
+            self._prefixes = {}
+
+    @classmethod
+    def merge(cls, snapshots):
+        """Sums the snapshots of several processes."""
+        merged = {}
+
+        for snapshot in snapshots:
+            for prefix, stats in snapshot.iteritems():
+                total = merged.setdefault(prefix, cls._empty())
+
+                for name in cls.COUNTERS + ('ms',):
+                    total[name] += stats.get(name, 0)
+
+                for i, count in enumerate(stats.get('latency', [])):
+                    total['latency'][i] += count
+
+        return merged
+
+    @classmethod
+    def report(cls, snapshot):
+        """Snapshot with the hit ratio, the mean latency and labeled buckets."""
+        labels = ['<=%sms' % bound for bound in cls.LATENCY_BUCKETS]
+        labels.append('>%sms' % cls.LATENCY_BUCKETS[-1])
+
+        report = {}
+        for prefix, stats in snapshot.iteritems():
+            reads = stats['hits'] + stats['misses']
+            report[prefix] = dict(
+                [(name, stats[name]) for name in cls.COUNTERS],
+                hit_ratio=round(float(stats['hits']) / reads, 4) if reads else None,
+                mean_ms=round(stats['ms'] / stats['calls'], 3) if stats['calls'] else None,
+                latency=dict(zip(labels, stats['latency'])))
+
+        return report
+
+    @classmethod
+    def _empty(cls):
+        stats = dict((name, 0) for name in cls.COUNTERS)
+        stats['ms'] = 0.0
+        stats['latency'] = [0] * (len(cls.LATENCY_BUCKETS) + 1)
+        return stats
@@ -0,0 +1,12 @@
+# -*- coding: utf8 -*-
+
+from flask import g
+import app
+
+
+@app.mq.task(ignore_result=True)
+def refresh_cached_view(endpoint, path, query_string, view_args):
+    """Recomputes a stale view cached with `CacheHelper.cached_swr`."""
+    with app.app.test_request_context(path, query_string=query_string):
+        g._cache_swr_refresh = True
+        app.app.view_functions[endpoint](**(view_args or {}))
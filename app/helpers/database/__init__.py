@@ -2,3 +2,4 @@
 
 from .model import ModelHelper
 from .mutable import MutableObject
+from .loader import BatchLoader
@@ -0,0 +1,42 @@
+# -*- coding: utf8 -*-
+
+
+class BatchLoader(object):
+    """Collects the ids of several models and resolves them in batch.
+
+    Every call to `load` runs a single `IN` query per model (through
+    `ModelHelper.get_many`) for the ids added since the previous call,
+    records are then read with `get`.
+    """
+
+    def __init__(self):
+        self._pending = {}
+        self._records = {}
+
+    def add(self, model, id):
+        if not id:
+            return
+        self._pending.setdefault(model, set()).add(id)
+
+    def load(self):
+        for model, ids in self._pending.iteritems():
+            records = self._records.setdefault(model, {})
+            missing = [id for id in ids if id not in records]
+
+            if not missing:
+                continue
+
+            for record in model.get_many(missing):
+                records[record.id] = record
+
+            # remember the ids that do not exist to skip them next time
+            for id in missing:
+                records.setdefault(id, None)
+
+        self._pending = {}
+
+    def get(self, model, id):
+        return self._records.get(model, {}).get(id)
+
+    def values(self, model):
+        return [r for r in self._records.get(model, {}).itervalues() if r is not None]
@@ -1,9 +1,12 @@
 # -*- coding: utf8 -*-
 
+from flask import g, has_app_context
 from sqlalchemy import literal, text, or_
 import app
 import datetime
 
+_MISSING = object()
+
 
 class ModelHelper(object):
 
@@ -32,12 +35,14 @@ class ModelHelper(object):
             setattr(self, 'modified_at', datetime.datetime.utcnow())
         if commit:
             app.sa.session.commit()
+        self._identity_set(getattr(self, 'id', None), self)
         return self
 
     def remove(self, commit=True):
         app.sa.session.delete(self)
         if commit:
             app.sa.session.commit()
+        self._identity_set(getattr(self, 'id', None), None)
 
     def set_attribute(self, key, value):
         self.attr = self.attr or {}
@@ -72,12 +77,82 @@ class ModelHelper(object):
     @classmethod
     def rollback_transaction(cls):
         app.sa.session.rollback()
+        cls.clear_identity_cache()
 
     @classmethod
     def get_by_id(cls, id):
         if id is None:
             return None
-        return cls.query.get(id)
+
+        record = cls._identity_get(id)
+
+        if record is _MISSING:
+            record = cls.query.get(id)
+            cls._identity_set(id, record)
+
+        return record
+
+    @classmethod
+    def get_many(cls, ids):
+        """Returns the records of the given ids (in the same order) with a
+        single IN query for the ids that were not looked up in the request.
+        """
+        ids = [id for id in ids if id is not None]
+        missing = [id for id in set(ids) if cls._identity_get(id) is _MISSING]
+
+        if missing:
+            records = dict((r.id, r) for r in cls.query.filter(cls.id.in_(missing)))
+            for id in missing:
+                cls._identity_set(id, records.get(id))
+
+        records = [cls._identity_get(id, count=False) for id in ids]
+        return [r for r in records if r is not None and r is not _MISSING]
+
+    @classmethod
+    def identity_cache_stats(cls):
+        """Hits and misses of the lookups by id in the current request."""
+        if not has_app_context():
+            return {}
+        return dict(getattr(g, '_identity_stats', {}))
+
+    @classmethod
+    def clear_identity_cache(cls):
+        if has_app_context():
+            g._identity_cache = {}
+
+    @classmethod
+    def _identity_records(cls):
+        # lookups are cached per request, outside of it there is no cache
+        if not has_app_context():
+            return None
+        if not hasattr(g, '_identity_cache'):
+            g._identity_cache = {}
+        return g._identity_cache.setdefault(cls.__name__, {})
+
+    @classmethod
+    def _identity_get(cls, id, count=True):
+        records = cls._identity_records()
+        record = _MISSING if records is None else records.get(id, _MISSING)
+
+        if count and records is not None:
+            if not hasattr(g, '_identity_stats'):
+                g._identity_stats = {}
+            stats = g._identity_stats.setdefault(cls.__name__, {'hits': 0, 'misses': 0})
+            stats['misses' if record is _MISSING else 'hits'] += 1
+
+        return record
+
+    @classmethod
+    def _identity_set(cls, id, record):
+        records = cls._identity_records()
+        if records is not None and id is not None:
+            records[id] = record
+
+    @classmethod
+    def _identity_pop(cls, id):
+        records = cls._identity_records()
+        if records is not None:
+            records.pop(id, None)
 
     @classmethod
     def get(cls, id):
@@ -95,6 +170,7 @@ class ModelHelper(object):
     @classmethod
     def delete(cls, id, commit=True):
         cls.query.filter_by(id=id).delete()
+        cls._identity_pop(id)
         if commit:
             app.sa.session.commit()
         return True
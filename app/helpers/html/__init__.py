@@ -1,4 +1,4 @@
 # -*- coding: utf8 -*-
 
 from .helper import render_view
-from .decorators import nocache
+from .decorators import nocache, conditional
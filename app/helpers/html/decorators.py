@@ -1,8 +1,10 @@
 # -*- coding: utf8 -*-
 
-from flask import make_response
+from flask import make_response, request, current_app
+from flask_login import current_user
 from functools import wraps, update_wrapper
 import datetime
+import hashlib
 
 
 def nocache(f):
@@ -15,3 +17,56 @@ def nocache(f):
         response.headers['Expires'] = '-1'
         return response
     return update_wrapper(no_cache, f)
+
+
+def conditional(version):
+    """Answers conditional GETs with a 304 when the data did not change.
+
+    `version` is called with the arguments of the view and returns the
+    values identifying the state of the data with its last modification
+    date, as `(values, last_modified)`, or None when the view must run
+    anyway (not found...). The weak ETag hashes those values with the url
+    and the current user, the payload is never built to compute it.
+    """
+    def decorator(f):
+        @wraps(f)
+        def decorated_function(*args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return f(*args, **kwargs)
+
+            current = version(**kwargs)
+
+            if current is None:
+                return f(*args, **kwargs)
+
+            values, last_modified = current
+            etag = hashlib.sha1(repr((request.full_path,
+                                      current_user.get_id(),
+                                      values))).hexdigest()
+
+            if last_modified is not None:
+                # http dates have no microseconds
+                last_modified = last_modified.replace(microsecond=0)
+
+            if request.if_none_match:
+                not_modified = request.if_none_match.contains_weak(etag)
+            else:
+                not_modified = (last_modified is not None and
+                                request.if_modified_since is not None and
+                                last_modified <= request.if_modified_since)
+
+            if not_modified:
+                response = current_app.response_class(status=304)
+            else:
+                response = make_response(f(*args, **kwargs))
+
+                if response.status_code != 200:
+                    return response
+
+            response.set_etag(etag, weak=True)
+            response.last_modified = last_modified
+            # the clients may keep the response but must check it first
+            response.headers['Cache-Control'] = 'private, no-cache'
+            return response
+        return decorated_function
+    return decorator
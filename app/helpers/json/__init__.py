@@ -1,5 +1,7 @@
 # -*- coding: utf8 -*-
 
-from .helper import render_json, render_json_template, is_json_request
+from .helper import render_json, render_json_stream, render_json_template, is_json_request
 from .http import HttpJsonEncoder
 from .database import DatabaseJSONEncoder
+from .serializer import serialize, register_serializer
+from .ids import encode_ids, decode_ids
@@ -1,8 +1,9 @@
 # -*- coding: utf8 -*-
 
-from flask import request, jsonify, render_template, make_response
+from flask import request, render_template, make_response, current_app, stream_with_context
 from flask_wtf import Form
 from werkzeug.exceptions import HTTPException, NotFound
+from .serializer import dumps
 import datetime
 
 
@@ -34,17 +35,56 @@ def render_json(message=None, status=None, error=None, **kwargs):
         data['message'] = str(message)
 
     if kwargs:
-        data['data'] = {}
-        for key, obj in kwargs.iteritems():
-            if isinstance(obj, Form):
-                continue
-            data['data'][key] = obj
+        for key in [k for k, obj in kwargs.iteritems() if isinstance(obj, Form)]:
+            del kwargs[key]
+        data['data'] = kwargs
 
-    response = jsonify(**data)
+    response = current_app.response_class(dumps(data),
+                                          mimetype='application/json')
     response.status_code = status_code
     return response
 
 
+def render_json_stream(name, items, chunk_size=100, **kwargs):
+    """Streams the json envelope of `render_json` with the `items` list.
+
+    The items are serialized and sent in chunks while they are iterated,
+    so a query iterated with `yield_per` keeps the memory flat regardless
+    of the number of records.
+    """
+    envelope = {
+        'status': True,
+        'datetime': datetime.datetime.utcnow()
+    }
+
+    # the objects are left open and closed by hand after the items
+    head = '%s,"data":%s%s%s:[' % (dumps(envelope)[:-1],
+                                   dumps(kwargs)[:-1],
+                                   ',' if kwargs else '',
+                                   dumps(name))
+
+    def generate():
+        yield head
+
+        separator = ''
+        chunk = []
+        for item in items:
+            chunk.append(dumps(item))
+            if len(chunk) >= chunk_size:
+                yield separator + ','.join(chunk)
+                separator = ','
+                chunk = []
+
+        if chunk:
+            yield separator + ','.join(chunk)
+
+        yield ']}}'
+
+    response = current_app.response_class(stream_with_context(generate()),
+                                          mimetype='application/json')
+    return response
+
+
 def render_json_template(template, *args, **kwargs):
     r = make_response(render_template(template, *args, **kwargs))
     r.headers.set('Content-Type', 'application/json')
@@ -0,0 +1,59 @@
+# -*- coding: utf8 -*-
+
+import base64
+
+ENCODINGS = ('list', 'delta', 'bitmap')
+
+
+def encode_ids(ids, encoding='list'):
+    """Compacts a set of ids for json.
+
+    - `list`: the ids as they are.
+    - `delta`: the sorted ids as differences to the previous one, small
+      numbers for the ids of a user that are close to each other.
+    - `bitmap`: `{'offset': min id, 'bitmap': base64}` where the bit `i`
+      (lowest bit of each byte first) is set when `offset + i` is an id.
+    """
+    if encoding == 'list':
+        return list(ids)
+
+    ids = sorted(set(ids))
+
+    if encoding == 'delta':
+        return [id - previous for previous, id in zip([0] + ids, ids)]
+
+    if encoding == 'bitmap':
+        if not ids:
+            return {'offset': 0, 'bitmap': ''}
+
+        offset = ids[0]
+        bitmap = bytearray((ids[-1] - offset) // 8 + 1)
+
+        for id in ids:
+            bitmap[(id - offset) // 8] |= 1 << ((id - offset) % 8)
+
+        return {'offset': offset, 'bitmap': base64.b64encode(bytes(bitmap))}
+
+    raise ValueError('unknown encoding %s' % encoding)
+
+
+def decode_ids(value, encoding='list'):
+    """Reverses `encode_ids`, returns the sorted ids for the compact ones."""
+    if encoding == 'list':
+        return list(value)
+
+    if encoding == 'delta':
+        ids = []
+        total = 0
+        for delta in value:
+            total += delta
+            ids.append(total)
+        return ids
+
+    if encoding == 'bitmap':
+        bitmap = bytearray(base64.b64decode(value['bitmap']))
+        return [value['offset'] + i * 8 + bit
+                for i, byte in enumerate(bitmap)
+                for bit in range(8) if byte & (1 << bit)]
+
+    raise ValueError('unknown encoding %s' % encoding)
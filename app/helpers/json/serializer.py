@@ -0,0 +1,73 @@
+# -*- coding: utf8 -*-
+
+from itertools import izip
+from decimal import Decimal
+import datetime
+import json
+import operator
+import time
+
+_PRIMITIVES = (basestring, bool, int, long, float, type(None))
+
+# compiled serializers by class, see `compile_serializer`
+_serializers = {}
+
+
+def register_serializer(cls, serializer):
+    """Registers a function returning the json-ready value of `cls` objects."""
+    _serializers[cls] = serializer
+
+
+def compile_serializer(cls):
+    """Builds the serializer of `cls` once, instead of walking its fields for
+    every object the way `HttpJsonEncoder` does."""
+    if issubclass(cls, (datetime.datetime, datetime.date)):
+        return _timestamp
+
+    if issubclass(cls, Decimal):
+        return float
+
+    if hasattr(cls, '__json_meta__'):
+        fields = tuple(cls.__json_meta__)
+        getter = operator.attrgetter(*fields)
+
+        if len(fields) == 1:
+            return lambda obj: {fields[0]: serialize(getter(obj))}
+
+        return lambda obj: dict(izip(fields, [serialize(v) for v in getter(obj)]))
+
+    return _fallback
+
+
+def serialize(obj):
+    """Converts `obj` into json-ready values (dicts, lists and primitives)."""
+    if isinstance(obj, _PRIMITIVES):
+        return obj
+
+    if isinstance(obj, dict):
+        return dict((key, serialize(value)) for key, value in obj.iteritems())
+
+    if isinstance(obj, (list, tuple)):
+        return [serialize(value) for value in obj]
+
+    cls = obj.__class__
+    serializer = _serializers.get(cls)
+
+    if serializer is None:
+        serializer = _serializers[cls] = compile_serializer(cls)
+
+    return serializer(obj)
+
+
+def dumps(obj):
+    return json.dumps(serialize(obj), separators=(',', ':'))
+
+
+def _timestamp(obj):
+    # same value as `strftime('%s')`, without formatting and parsing a string
+    return long(time.mktime(obj.timetuple()))
+
+
+def _fallback(obj):
+    from .http import HttpJsonEncoder
+    return serialize(HttpJsonEncoder().default(obj))
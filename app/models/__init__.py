@@ -4,9 +4,10 @@ Base = declarative_base()
 
 from .categories import Category  # noqa
 from .comments import Comment  # noqa
-from .posts import Post  # noqa
+from .posts import Post, PageViews  # noqa
 from .users import User, Role, GuestUser  # noqa
 from .pictures import Picture  # noqa
-from .feed import Feed  # noqa
+from .feed import Feed, Ranking  # noqa
 from .votes import Vote  # noqa
 from .auth import AuthTokens  # noqa
+from .search import StorySearch  # noqa
@@ -169,6 +169,12 @@ class Category(Base, sa.Model, ModelHelper):
             records = query.order_by(sa.text(sort_by)).all()
         return records, count
 
+    @classmethod
+    def version(cls):
+        """Count and last modification of the categories."""
+        return sa.session.query(sa.func.count(cls.id),
+                                sa.func.max(cls.modified_at)).one()
+
     @classmethod
     def get_list(cls):
         return [(g.id, g.name) for g in cls.query.all()]
@@ -3,13 +3,19 @@
 from flask_login import current_user
 from app import sa
 from app.models import Base
-from app.helpers import ModelHelper, MutableObject
+from app.helpers import ModelHelper, MutableObject, BatchLoader, serialize
+from sqlalchemy import Index, or_
+from sqlalchemy.orm import joinedload
 import datetime
 
 
 class Comment(Base, sa.Model, ModelHelper):
 
     __tablename__ = 'comments'
+    __table_args__ = (
+        Index('idx_post_parent', 'post_id', 'comment_id', 'id'),
+        Index('idx_post_thread', 'post_id', 'thread_id'),
+    )
 
     __json_meta__ = [
         'id',
@@ -18,6 +24,7 @@ class Comment(Base, sa.Model, ModelHelper):
         'post_id',
         'comment_id',
         'children',
+        'reply_count',
         'created_at',
         'modified_at'
     ]
@@ -33,6 +40,9 @@ class Comment(Base, sa.Model, ModelHelper):
                                       onupdate='NO ACTION'))
 
     comment_id = sa.Column(sa.Integer, default=0, index=True, nullable=False)
+    # top-level comment of the thread, 0 for top-level comments and NULL
+    # until the row is backfilled
+    thread_id = sa.Column(sa.Integer)
     text = sa.Column(sa.Text)
 
     created_at = sa.Column(sa.DateTime, default=datetime.datetime.utcnow)
@@ -85,3 +95,151 @@ class Comment(Base, sa.Model, ModelHelper):
     @children.setter
     def children(self, value):
         self._children = value
+
+    @property
+    def reply_count(self):
+        return getattr(self, '_reply_count', 0)
+
+    def save(self, commit=True):
+        from app.models import Post
+
+        if self.id is None:
+            self.thread_id = self.find_thread_id()
+            Post.add_comments(self.post_id or self.post.id, 1)
+
+        result = super(Comment, self).save(commit=commit)
+
+        if commit:
+            self.notify_story('story_comment_saved', self.post_id, {'comment': serialize(self)})
+
+        return result
+
+    def find_thread_id(self):
+        comment = self
+
+        # walks up the parents which are not backfilled yet
+        while comment.comment_id:
+            parent = comment.parent_comment
+
+            if parent is None:
+                return comment.comment_id
+            if parent.thread_id is not None:
+                return parent.thread_id or parent.id
+
+            comment = parent
+
+        return 0 if comment is self else comment.id
+
+    @classmethod
+    def delete(cls, id, commit=True):
+        from app.models import Post
+
+        comment = cls.get_by_id(id)
+
+        if comment is not None:
+            post_id = comment.post_id
+            Post.add_comments(post_id, -1)
+
+        result = super(Comment, cls).delete(id, commit=commit)
+
+        if comment is not None and commit:
+            cls.notify_story('story_comment_deleted', post_id, {'id': id})
+
+        return result
+
+    @classmethod
+    def notify_story(cls, event, post_id, data):
+        """Sends a committed change of a comment to the sockets displaying
+        its story, whatever the view that made it."""
+        from app.events.broadcast import emit_story
+        from app import app
+
+        try:
+            emit_story(event, post_id, dict(data, post_id=post_id))
+        except Exception as e:
+            # the comment is saved, a lost notification is not worth an error
+            app.logger.error(u'[Comment] error notifying the story, %s', e, exc_info=True)
+
+    @classmethod
+    def threads(cls, post_id, page=1, limit=None):
+        """Top-level comments of the post with their replies nested.
+
+        A page of top-level comments is loaded with their authors, then
+        all the replies of those threads with theirs, the profile pictures
+        in a single IN query. Every top-level comment gets its
+        `reply_count`. Returns `(threads, total)`, total being the number
+        of top-level comments.
+        """
+        query = cls.query.filter_by(post_id=post_id, comment_id=0)
+        total = query.count()
+
+        query = query.options(joinedload('user')).order_by(cls.id)
+
+        if limit:
+            query = query.offset((page - 1) * limit).limit(limit)
+
+        threads = query.all()
+
+        if not threads:
+            return [], total
+
+        replies = cls.query \
+            .options(joinedload('user')) \
+            .filter(cls.post_id == post_id,
+                    cls.comment_id != 0,
+                    or_(cls.thread_id.in_([c.id for c in threads]),
+                        cls.thread_id.is_(None))) \
+            .order_by(cls.id) \
+            .all()
+
+        comments = threads + replies
+        cls.preload_profiles(comments)
+
+        data = dict((c.id, c) for c in comments)
+
+        for comment in comments:
+            comment.children = []
+
+        for reply in replies:
+            parent = data.get(reply.comment_id)
+            if parent is not None:
+                parent.children.append(reply)
+
+        for thread in threads:
+            count = 0
+            pending = list(thread.children)
+            while pending:
+                count += 1
+                pending.extend(pending.pop().children)
+            thread._reply_count = count
+
+        return threads, total
+
+    @classmethod
+    def preload_profiles(cls, comments):
+        """Loads the profile pictures of the authors in one query."""
+        from app.models import Picture
+
+        loader = BatchLoader()
+        users = set(c.user for c in comments if c.user is not None)
+
+        for user in users:
+            loader.add(Picture, user.profile_picture_id)
+
+        loader.load()
+
+        for user in users:
+            user._profile_picture = loader.get(Picture, user.profile_picture_id)
+
+    @classmethod
+    def version_by_post(cls, post_id):
+        """Count and last modification of the comments of the post and of
+        their authors, in a single query."""
+        from app.models import User
+
+        return sa.session.query(sa.func.count(cls.id),
+                                sa.func.max(cls.modified_at),
+                                sa.func.max(User.modified_at)) \
+            .join(User, User.id == cls.user_id) \
+            .filter(cls.post_id == post_id) \
+            .one()
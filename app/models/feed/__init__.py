@@ -1,3 +1,4 @@
 # -*- coding: utf8 -*-
 
 from .feed import Feed
+from .ranking import Ranking
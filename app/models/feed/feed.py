@@ -1,9 +1,11 @@
 # -*- coding: utf8 -*-
 
 from flask import request
+from sqlalchemy import and_, or_
 from app.models import Post
 import app
 import math
+import base64
 import datetime
 import hashlib
 
@@ -15,8 +17,13 @@ class Feed:
 
     CACHE_FEED_LIST = 'stamps/feeds.v1'
     CACHE_FEED_POST = 'stamps/posts'
+    CACHE_FEED_PAGE = 'stamps/feed'
+    CACHE_FEED_TAG = 'stamps/tags'
     CACHE_FEED_EXPIRED_AT = 3600 * 24 * 7
+    CACHE_FEED_TOTAL = 'stamps/total'
+    CACHE_FEED_TOTAL_EXPIRED_AT = 300
     FEED_DEFAULT_LIMIT = 100
+    FEED_CURSOR_DATE_FORMAT = '%Y%m%d%H%M%S%f'
 
     vote_factor = 10
     epoch = datetime.datetime(1970, 1, 1)
@@ -41,55 +48,121 @@ class Feed:
     @classmethod
     def get_feed_cache(cls, name, page=1, limit=FEED_DEFAULT_LIMIT, lang='en'):
         key = u'%s.%s.%s.%s' % (name, page, limit, lang)
-        return app.cache.get(key)
+        return app.cache.get(app.cache.namespaced_key(cls.CACHE_FEED_LIST, key))
 
     @classmethod
     def set_feed_cache(cls, name, data, page=1, limit=FEED_DEFAULT_LIMIT, duration=3600, lang='en'):
         key = u'%s.%s.%s.%s' % (name, page, limit, lang)
-        app.cache.set(key, data, duration)
-
-        feed_list = app.cache.get(cls.CACHE_FEED_LIST) or []
-
-        if key not in feed_list:
-            feed_list.append(key)
-            app.cache.set(cls.CACHE_FEED_LIST, feed_list, 3600 * 24)
+        app.cache.set(app.cache.namespaced_key(cls.CACHE_FEED_LIST, key), data, duration)
 
     @classmethod
     def clear_feed_cache(cls):
-        keys = app.cache.get(cls.CACHE_FEED_LIST) or []
-        for key in keys:
-            app.cache.set(key, None)
+        app.cache.bump_namespace(cls.CACHE_FEED_LIST)
+
+    @classmethod
+    def get_feed_page(cls):
+        """Cached data of the feed page of the current request and whether
+        the request took the lock of the page, `(data, owns_lock)`.
+
+        The page is stale when any of the namespaces it depends on was
+        bumped after it was cached. Only one worker takes the lock and
+        rebuilds a stale or missing page, it calls `release_feed_page` once
+        done, whether it succeeded or not. The others are served the stale
+        page or wait for the new one, and rebuild it without the lock when
+        the wait times out.
+        """
+        key = cls._feed_page_key()
+        cached = app.cache.get(key)
+
+        if cached is None:
+            if app.cache.lock(key):
+                return None, True
+            cached = app.cache.wait_for(key)
+            return (cached[0] if cached else None), False
+
+        data, dependencies = cached
+
+        if app.cache.namespace_generations(dependencies.keys()) == dependencies:
+            return data, False
+
+        return (None, True) if app.cache.lock(key) else (data, False)
 
     @classmethod
-    def forced_update_posts(cls):
-        request_id = cls._make_request_id()
-        bucket = app.cache.get(cls.CACHE_FEED_POST) or []
+    def set_feed_page(cls, data, post_ids, category_id=0, first_page=False):
+        """Caches the data of the feed page of the current request.
+
+        The page depends on the namespace of each of its posts, and first
+        pages on the namespace of their category, so writes only evict the
+        pages they affect.
+        """
+        namespaces = [cls.CACHE_FEED_POST] + [cls._post_tag(id) for id in post_ids]
 
-        if request_id in bucket:
-            return False
+        if first_page:
+            namespaces.append(cls._category_tag(category_id))
 
-        bucket.append(request_id)
+        # writes landing between the query and this snapshot are missed
+        # until the page expires, the window is the time to build the page
+        dependencies = app.cache.namespace_generations(namespaces)
 
-        app.cache.delete(cls.CACHE_FEED_POST)
-        app.cache.set(cls.CACHE_FEED_POST, bucket, cls.CACHE_FEED_EXPIRED_AT)
+        key = cls._feed_page_key()
+        app.cache.set(key, (data, dependencies), cls.CACHE_FEED_EXPIRED_AT)
 
-        return True
+    @classmethod
+    def release_feed_page(cls):
+        """Releases the lock of the feed page taken by `get_feed_page`."""
+        app.cache.unlock(cls._feed_page_key())
+
+    @classmethod
+    def invalidate_post(cls, post_id, category_id=None):
+        """Evicts the cached feed pages containing the post.
+
+        When the post enters or leaves the feed (publish, hide, delete) the
+        category is given too and the first pages of the category and of
+        the feed of all categories are evicted as well.
+        """
+        app.cache.bump_namespace(cls._post_tag(post_id))
+
+        if category_id is not None:
+            app.cache.bump_namespace(cls._category_tag(category_id))
+            app.cache.bump_namespace(cls._category_tag(0))
 
     @classmethod
     def clear_cached_posts(cls):
-        bucket = app.cache.get(cls.CACHE_FEED_POST) or []
-        for item in bucket:
-            app.cache.delete(item)
-        app.cache.delete(cls.CACHE_FEED_POST)
+        app.cache.bump_namespace(cls.CACHE_FEED_POST)
+
+    @classmethod
+    def version(cls, post_id=None):
+        """Generations of the feed namespaces a page depends on.
+
+        The page of a story depends on the namespace of its post, the
+        pages listing stories on the first pages of the feed. Both change
+        with `clear_cached_posts`.
+        """
+        tag = cls._post_tag(post_id) if post_id else cls._category_tag(0)
+        generations = app.cache.namespace_generations([cls.CACHE_FEED_POST, tag])
+        return tuple(sorted(generations.items()))
+
+    @classmethod
+    def _post_tag(cls, post_id):
+        return u'%s/post.%s' % (cls.CACHE_FEED_TAG, post_id)
+
+    @classmethod
+    def _category_tag(cls, category_id):
+        return u'%s/category.%s' % (cls.CACHE_FEED_TAG, category_id or 0)
+
+    @classmethod
+    def _feed_page_key(cls):
+        # stable key, the stale page stays available while it is rebuilt
+        return u'%s.%s' % (cls.CACHE_FEED_PAGE, cls._make_request_id())
 
     @classmethod
     def posts(cls, category_id=0, page=1, limit=10, status=Post.POST_PUBLIC, orderby='created_at', desc=True):
         q = None
 
         if category_id:
-            q = Post.query.filter_by(status=status, category_id=category_id)
+            q = Post.list_query().filter_by(status=status, category_id=category_id)
         else:
-            q = Post.query.filter_by(status=status)
+            q = Post.list_query().filter_by(status=status)
 
         count = q.count()
         records = []
@@ -103,22 +176,104 @@ class Feed:
 
         return list(records), count
 
+    @classmethod
+    def posts_after(cls, category_id=0, after=None, limit=10, status=Post.POST_PUBLIC):
+        """Keyset pagination over (created_at, id), newest first.
+
+        Returns the records and the cursor of the next page, the cursor is
+        None when there are no more records to walk through.
+        """
+        q = Post.list_query().filter_by(status=status)
+
+        if category_id:
+            q = q.filter_by(category_id=category_id)
+
+        if after:
+            created_at, id = after
+            q = q.filter(or_(Post.created_at < created_at,
+                             and_(Post.created_at == created_at,
+                                  Post.id < id)))
+
+        # fetch one extra record to know if there is a next page
+        records = q.order_by(Post.created_at.desc(), Post.id.desc()) \
+            .limit(limit + 1) \
+            .all()
+
+        cursor = None
+
+        if len(records) > limit:
+            records = records[:limit]
+            cursor = cls.encode_cursor(records[-1])
+
+        return records, cursor
+
+    @classmethod
+    def encode_cursor(cls, post):
+        value = '%s.%s' % (post.created_at.strftime(cls.FEED_CURSOR_DATE_FORMAT), post.id)
+        return base64.urlsafe_b64encode(value).rstrip('=')
+
+    @classmethod
+    def decode_cursor(cls, cursor):
+        """Returns the (created_at, id) pair of the cursor or None if invalid."""
+        if not cursor:
+            return None
+
+        try:
+            cursor = str(cursor)
+            value = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+            created_at, id = value.split('.')
+            return (datetime.datetime.strptime(created_at, cls.FEED_CURSOR_DATE_FORMAT),
+                    long(id))
+        except (TypeError, ValueError, UnicodeError):
+            return None
+
+    @classmethod
+    def total_posts(cls, category_id=0, status=Post.POST_PUBLIC):
+        """Number of posts in the feed, served from a short lived counter."""
+        key = u'%s.%s.%s' % (cls.CACHE_FEED_TOTAL, category_id, status)
+        total = app.cache.get(key)
+
+        if total is None:
+            q = Post.query.filter_by(status=status)
+
+            if category_id:
+                q = q.filter_by(category_id=category_id)
+
+            total = q.count()
+            app.cache.set(key, total, cls.CACHE_FEED_TOTAL_EXPIRED_AT)
+
+        return total
+
     @classmethod
     def ranking(cls, page=1, limit=20):
-        from app.models import Post
-        query = Post.query.filter_by(status=Post.POST_PUBLIC)
-        count = query.count()
+        from app.models import Post, Ranking
+        offset = (page - 1) * limit
+        ids = Ranking.slice(offset, limit)
+
         records = []
-        if count:
-            order = app.sa.text('score DESC')
-            offset = (page - 1) * limit
-            records = query.order_by(order).limit(limit).offset(offset)
-        return records, count
+        if ids:
+            posts = dict((post.id, post) for post in
+                         Post.list_query().filter(Post.id.in_(ids),
+                                                  Post.status == Post.POST_PUBLIC))
+            records = [posts[id] for id in ids if id in posts]
+
+        # some of the posts left the feed by a path that does not update the
+        # index, fall back to sql
+        if len(records) < len(ids):
+            query = Post.list_query().filter_by(status=Post.POST_PUBLIC)
+            count = query.count()
+            records = []
+            if count:
+                order = app.sa.text('score DESC, id DESC')
+                records = query.order_by(order).limit(limit).offset(offset)
+            return records, count
+
+        return records, cls.total_posts()
 
     @classmethod
     def category(cls, category, page=1, limit=20):
         from app.models import Post
-        query = Post.query.filter_by(category_id=category.id,
+        query = Post.list_query().filter_by(category_id=category.id,
                                      status=Post.POST_PUBLIC)
         count = query.count()
         records = []
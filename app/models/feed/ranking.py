@@ -0,0 +1,118 @@
+# -*- coding: utf8 -*-
+
+from app import sa
+from app.models import Base, Post
+from app.helpers import ModelHelper
+from sqlalchemy import Index
+from sqlalchemy.dialects.mysql import insert
+
+
+class RankingEntry(Base, sa.Model, ModelHelper):
+    """Score of a public post, a row of the ranking index."""
+
+    __tablename__ = 'ranking_entries'
+    __table_args__ = (
+        Index('idx_score_post', 'score', 'post_id'),
+    )
+
+    post_id = sa.Column(sa.Integer,
+                        sa.ForeignKey('posts.id',
+                                      ondelete='CASCADE',
+                                      onupdate='NO ACTION'),
+                        primary_key=True,
+                        autoincrement=False)
+    score = sa.Column(sa.Numeric(20, 7), nullable=False)
+
+
+class Ranking:
+    """Public posts ordered by `score DESC, id DESC`.
+
+    The index is the narrow `ranking_entries` table, pages are read from
+    its (score, post_id) index without touching the posts. A change of a
+    post writes its own row only, an upsert or a delete run in the
+    transaction of the change, so concurrent changes of different posts
+    never overwrite each other and the index is current once they commit.
+    """
+    # positions compared with the sql ordering by `check`
+    RANKING_SIZE = 1000
+
+    @classmethod
+    def entries(cls, limit=RANKING_SIZE):
+        records = sa.session.query(RankingEntry.score, RankingEntry.post_id) \
+            .order_by(RankingEntry.score.desc(), RankingEntry.post_id.desc()) \
+            .limit(limit)
+
+        return [(float(score), id) for score, id in records]
+
+    @classmethod
+    def rebuild(cls):
+        """Fills the index from the posts again, returns its number of posts."""
+        RankingEntry.query.delete(synchronize_session=False)
+
+        records = Post.query \
+            .with_entities(Post.id, sa.func.coalesce(Post.score, 0)) \
+            .filter_by(status=Post.POST_PUBLIC)
+
+        sa.session.execute(RankingEntry.__table__.insert().from_select(
+            ['post_id', 'score'], records))
+        sa.session.commit()
+
+        return RankingEntry.query.count()
+
+    @classmethod
+    def slice(cls, offset=0, limit=20):
+        """Returns the ids of the posts of the given page."""
+        records = sa.session.query(RankingEntry.post_id) \
+            .order_by(RankingEntry.score.desc(), RankingEntry.post_id.desc()) \
+            .limit(limit) \
+            .offset(offset)
+
+        return [id for id, in records]
+
+    @classmethod
+    def update(cls, post, commit=False):
+        """Writes the score of the post, or removes it when it is not public."""
+        # a new post is indexed once saved, when it is published
+        if post.id is None:
+            return
+
+        if post.status != Post.POST_PUBLIC:
+            return cls.remove(post.id, commit=commit)
+
+        statement = insert(RankingEntry.__table__).values(post_id=post.id,
+                                                          score=post.score or 0)
+        sa.session.execute(statement.on_duplicate_key_update(score=statement.inserted.score))
+
+        if commit:
+            sa.session.commit()
+
+    @classmethod
+    def remove(cls, post_id, commit=False):
+        RankingEntry.query.filter_by(post_id=post_id).delete(synchronize_session=False)
+
+        if commit:
+            sa.session.commit()
+
+    @classmethod
+    def check(cls):
+        """Compares the index against the sql ordering.
+
+        Returns a list of (position, index_id, sql_id) for every mismatch.
+        """
+        records = Post.query \
+            .with_entities(Post.id) \
+            .filter_by(status=Post.POST_PUBLIC) \
+            .order_by(Post.score.desc(), Post.id.desc()) \
+            .limit(cls.RANKING_SIZE)
+
+        expected = [id for id, in records]
+        current = [id for score, id in cls.entries()]
+
+        mismatches = []
+        for position in range(max(len(expected), len(current))):
+            index_id = current[position] if position < len(current) else None
+            sql_id = expected[position] if position < len(expected) else None
+            if index_id != sql_id:
+                mismatches.append((position, index_id, sql_id))
+
+        return mismatches
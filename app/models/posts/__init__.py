@@ -1,3 +1,4 @@
 # -*- coding: utf8 -*-
 
 from .post import Post
+from .page_views import PageViews
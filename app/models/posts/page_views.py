@@ -0,0 +1,93 @@
+# -*- coding: utf8 -*-
+
+import app
+import atexit
+import os
+import threading
+
+
+class PageViews:
+    """Write-behind buffer for the page views of the posts.
+
+    Page views are accumulated in memory per post and flushed in batches by
+    a background task of the process, every post gets a single update (and
+    a single score calculation) per flush interval instead of one
+    transaction per counted page view.
+    """
+    FLUSH_INTERVAL = app.app.config.get('PAGE_VIEWS_FLUSH_INTERVAL', 60)
+
+    _lock = threading.Lock()
+    _pending = {}
+    _flusher_pid = None
+
+    @classmethod
+    def add(cls, post_id, count=1):
+        with cls._lock:
+            cls._pending[post_id] = cls._pending.get(post_id, 0) + count
+
+        cls._start_flusher()
+
+    @classmethod
+    def pending(cls):
+        with cls._lock:
+            return dict(cls._pending)
+
+    @classmethod
+    def flush(cls):
+        """Write the pending page views to the database.
+
+        Returns the number of posts updated.
+        """
+        with cls._lock:
+            pending, cls._pending = cls._pending, {}
+
+        if not pending:
+            return 0
+
+        from app.models import Post
+
+        try:
+            Post.begin_transaction()
+
+            posts = Post.query.filter(Post.id.in_(pending.keys())).all()
+
+            for post in posts:
+                post.add_page_views(pending[post.id])
+
+            Post.commit_transaction()
+        except Exception as e:
+            Post.rollback_transaction()
+
+            # keep the page views for the next flush
+            with cls._lock:
+                for post_id, count in pending.iteritems():
+                    cls._pending[post_id] = cls._pending.get(post_id, 0) + count
+
+            app.app.logger.error(
+                u'[PageViews] error on flush, %s', e, exc_info=True)
+            return 0
+
+        return len(posts)
+
+    @classmethod
+    def _start_flusher(cls):
+        # background tasks do not survive a fork, every worker starts its own
+        if cls._flusher_pid == os.getpid():
+            return
+
+        cls._flusher_pid = os.getpid()
+        app.socketio.start_background_task(cls._run_flusher)
+
+    @classmethod
+    def _run_flusher(cls):
+        while True:
+            app.socketio.sleep(cls.FLUSH_INTERVAL)
+
+            with app.app.app_context():
+                try:
+                    cls.flush()
+                finally:
+                    app.sa.session.remove()
+
+
+atexit.register(PageViews.flush)
@@ -4,7 +4,12 @@ from flask import url_for
 from flask_login import current_user
 from app import sa
 from app.models import Base
-from app.helpers import ModelHelper, MutableObject
+from app.helpers import ModelHelper, MutableObject, BatchLoader
+from sqlalchemy import Index
+from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.orm import defer
+from sqlalchemy.orm.attributes import set_committed_value
+from jinja2 import Markup
 import datetime
 import base64
 
@@ -12,6 +17,10 @@ import base64
 class Post(Base, sa.Model, ModelHelper):
 
     __tablename__ = 'posts'
+    __table_args__ = (
+        Index('idx_status_created', 'status', 'created_at', 'id'),
+        Index('idx_category_status_created', 'category_id', 'status', 'created_at', 'id'),
+    )
 
     __json_meta__ = ['id',
                      'title',
@@ -28,6 +37,7 @@ class Post(Base, sa.Model, ModelHelper):
                      'category',
                      'anonymous',
                      'likes',
+                     'votes_version',
                      'is_hidden',
                      'is_editable',
                      'is_owner']
@@ -37,6 +47,16 @@ class Post(Base, sa.Model, ModelHelper):
     POST_DRAFT_2 = 0x101
     POST_HIDDEN = 0x800
 
+    COUNTERS = ('cover_picture_id',
+                'page_views',
+                'save_count',
+                'votes',
+                'down_votes',
+                'likes')
+
+    SUMMARY_LENGTH = 300
+    EXCERPT_LENGTH = 500
+
     KIND_STAMP = 1
     KIND_STORY = 2
 
@@ -59,6 +79,25 @@ class Post(Base, sa.Model, ModelHelper):
                       nullable=False,
                       server_default='0')
     attr = sa.Column(MutableObject.get_column())
+    # counters promoted from `attr`, NULL until the row is backfilled
+    _cover_picture_id = sa.Column('cover_picture_id', sa.Integer, index=True)
+    _page_views = sa.Column('page_views', sa.Integer, index=True)
+    _save_count = sa.Column('save_count', sa.Integer)
+    _votes = sa.Column('votes', sa.Integer)
+    _down_votes = sa.Column('down_votes', sa.Integer)
+    _likes = sa.Column('likes', sa.Integer, index=True)
+    # plain text previews of body/extra_body used by the list queries
+    _summary = sa.Column('summary', sa.String(512))
+    _excerpt = sa.Column('excerpt', sa.Text)
+    # number of comments, new posts start at 0, NULL until an older row is
+    # backfilled
+    _comment_count = sa.Column('comment_count', sa.Integer, default=0)
+    # bumped with the likes, orders the counts sent to the clients
+    _votes_version = sa.Column('votes_version',
+                               sa.Integer,
+                               default=0,
+                               nullable=False,
+                               server_default='0')
     created_at = sa.Column(sa.DateTime, default=datetime.datetime.utcnow)
     modified_at = sa.Column(sa.DateTime, default=datetime.datetime.utcnow)
     comments = sa.relationship('Comment', backref='post', lazy='dynamic')
@@ -72,6 +111,7 @@ class Post(Base, sa.Model, ModelHelper):
 
     @body.setter
     def body(self, value):
+        self._summary = self.make_excerpt(value, self.SUMMARY_LENGTH)
         return self.set_attribute('body', value)
 
     @property
@@ -80,60 +120,104 @@ class Post(Base, sa.Model, ModelHelper):
 
     @extra_body.setter
     def extra_body(self, value):
+        self._excerpt = self.make_excerpt(value, self.EXCERPT_LENGTH)
         return self.set_attribute('extra_body', value)
 
     @property
-    def cover_picture(self):
-        from app.models import Picture
-        return Picture.get_by_id(self.cover_picture_id)
+    def summary(self):
+        if self._summary is None:
+            return self.make_excerpt(self.body, self.SUMMARY_LENGTH)
+        return self._summary
 
     @property
+    def excerpt(self):
+        if self._excerpt is None:
+            return self.make_excerpt(self.extra_body, self.EXCERPT_LENGTH)
+        return self._excerpt
+
+    @property
+    def cover_picture(self):
+        if not hasattr(self, '_cover_picture'):
+            from app.models import Picture
+            self._cover_picture = Picture.get_by_id(self.cover_picture_id)
+        return self._cover_picture
+
+    @hybrid_property
     def cover_picture_id(self):
-        return self.get_attribute('cover_picture_id', 0)
+        return self.get_counter('cover_picture_id', 0)
 
     @cover_picture_id.setter
     def cover_picture_id(self, value):
-        return self.set_attribute('cover_picture_id', value)
+        self.__dict__.pop('_cover_picture', None)
+        self._cover_picture_id = value
 
-    @property
+    @cover_picture_id.expression
+    def cover_picture_id(cls):
+        return cls._cover_picture_id
+
+    @hybrid_property
     def page_views(self):
-        return self.get_attribute('page_views', 1)
+        return self.get_counter('page_views', 1)
 
     @page_views.setter
     def page_views(self, value):
-        return self.set_attribute('page_views', value)
+        self._page_views = value
 
-    @property
+    @page_views.expression
+    def page_views(cls):
+        return cls._page_views
+
+    @hybrid_property
     def save_count(self):
-        return self.get_attribute('save_count', 0)
+        return self.get_counter('save_count', 0)
 
     @save_count.setter
     def save_count(self, value):
-        return self.set_attribute('save_count', value)
+        self._save_count = value
 
-    @property
+    @save_count.expression
+    def save_count(cls):
+        return cls._save_count
+
+    @hybrid_property
     def votes(self):
-        return self.get_attribute('votes', 0)
+        return self.get_counter('votes', 0)
 
     @votes.setter
     def votes(self, value):
-        return self.set_attribute('votes', value)
+        self._votes = value
 
-    @property
+    @votes.expression
+    def votes(cls):
+        return cls._votes
+
+    @hybrid_property
     def down_votes(self):
-        return self.get_attribute('down_votes', 0)
+        return self.get_counter('down_votes', 0)
 
     @down_votes.setter
     def down_votes(self, value):
-        return self.set_attribute('down_votes', value)
+        self._down_votes = value
 
-    @property
+    @down_votes.expression
+    def down_votes(cls):
+        return cls._down_votes
+
+    @hybrid_property
     def likes(self):
-        return self.get_attribute('likes', 0)
+        return self.get_counter('likes', 0)
 
     @likes.setter
     def likes(self, value):
-        return self.set_attribute('likes', value)
+        self._likes = value
+
+    @likes.expression
+    def likes(cls):
+        return cls._likes
+
+    @property
+    def votes_version(self):
+        return self._votes_version or 0
 
     @property
     def editor_version(self):
@@ -169,6 +253,16 @@ class Post(Base, sa.Model, ModelHelper):
     def is_hidden(self):
         return self.status == self.POST_HIDDEN
 
+    @property
+    def version(self):
+        """Values changing whenever the rendered story changes."""
+        return (self.modified_at,
+                self.status,
+                self.likes,
+                self.cover_picture_id,
+                self.category_id,
+                self.user.modified_at if self.user else None)
+
     @property
     def is_draft(self):
         return self.status == self.POST_DRAFT or self.status == self.POST_DRAFT_2
@@ -188,43 +282,57 @@ class Post(Base, sa.Model, ModelHelper):
     @property
     def comment_list(self):
         if not hasattr(self, '_comment_list'):
-            data = dict([(item.id, item) for item in self.comments])
+            from app.models import Comment
+            self._comment_list = Comment.threads(self.id)[0]
 
-            for comment in self.comments:
-                comment.children = []
-                if comment.comment_id and comment.comment_id in data:
-                    data[comment.comment_id].children.append(comment)
+        return self._comment_list
 
-            self._comment_list = [c for c in self.comments if not c.comment_id]
+    @property
+    def comment_count(self):
+        if self._comment_count is None:
+            return self.comments.count()
+        return self._comment_count
 
-        return self._comment_list
+    @classmethod
+    def add_comments(cls, id, delta):
+        """Atomically moves the comment count, rows not backfilled stay NULL."""
+        return cls.query.filter_by(id=id).update(
+            {cls._comment_count: cls._comment_count + delta},
+            synchronize_session=False)
+
+    def get_counter(self, name, default=0):
+        # dual-read: rows not backfilled yet keep the counter in `attr`
+        value = getattr(self, '_%s' % name)
+        if value is None:
+            return self.get_attribute(name, default)
+        return value
 
     def is_mine(self):
         return (current_user.is_authenticated and
-                self.user.id == current_user.id)
+                self.user_id == current_user.id)
 
 
 
     def can_edit(self):
         return (current_user.is_authenticated and
-                (self.user.id == current_user.id or current_user.is_admin))
+                (self.user_id == current_user.id or current_user.is_admin))
 
     @property
     def is_owner(self):
         return (current_user.is_authenticated and
-                self.user.id == current_user.id)
+                self.user_id == current_user.id)
 
     @property
     def is_editable(self):
         return (current_user.is_authenticated and
-                (self.user.id == current_user.id or current_user.is_admin))
+                (self.user_id == current_user.id or current_user.is_admin))
 
     @property
     def need_reply(self):
         return current_user.is_authenticated and self.user_id != current_user.id
 
     def update_score(self, page_view=0, vote=0, down_vote=0):
-        from app.models import Feed
+        from app.models import Feed, Ranking
 
         scale = 10
 
@@ -242,6 +350,121 @@ class Post(Base, sa.Model, ModelHelper):
                                 downs=self.down_votes,
                                 date=self.created_at)
 
+        Ranking.update(self)
+
+    @classmethod
+    def increment(cls, id, values=None, **deltas):
+        """Atomically adds the deltas to the counter columns of the post.
+
+        Runs a single `UPDATE posts SET likes = likes + 1, ...` statement,
+        `values` are extra columns set as given (e.g. the score).
+        """
+        values = dict(values or {})
+
+        for name, delta in deltas.iteritems():
+            column = getattr(cls, name)
+            values[column] = sa.func.coalesce(column, 0) + delta
+
+        return cls.query.filter_by(id=id).update(values, synchronize_session=False)
+
+    def add_page_views(self, count):
+        """Atomic page views increment, the score is computed once."""
+        from app.models import Feed, Ranking
+
+        if self._page_views is None:
+            # the row is not backfilled yet, its counters live in `attr`
+            self.update_score(page_view=count)
+            return self.save(commit=False)
+
+        page_views = self.page_views + count
+        score = Feed.score(page_views=page_views,
+                           ups=self.votes,
+                           downs=self.down_votes,
+                           date=self.created_at)
+
+        Post.increment(self.id, values={Post.score: score}, page_views=count)
+
+        # reflect the new values without flagging the instance as dirty
+        set_committed_value(self, '_page_views', page_views)
+        set_committed_value(self, 'score', score)
+
+        Ranking.update(self)
+        return self
+
+    def add_votes(self, delta):
+        """Atomic likes and votes delta, the likes are read back from the row."""
+        from app.models import Feed, Ranking
+
+        if self._likes is None or self._votes is None:
+            # the row is not backfilled yet, its counters live in `attr`
+            self.likes = self.votes = max(self.likes + delta, 0)
+            self._votes_version = self.votes_version + 1
+            self.update_score()
+            return self.save(commit=False)
+
+        modified_at = datetime.datetime.utcnow()
+
+        Post.increment(self.id,
+                       values={Post.modified_at: modified_at},
+                       likes=delta,
+                       votes=delta,
+                       _votes_version=1)
+
+        # the row is locked by the update until the commit, so the values
+        # read back include the concurrent votes committed before
+        likes, votes, version = sa.session.query(Post._likes, Post._votes, Post._votes_version) \
+            .filter_by(id=self.id) \
+            .one()
+
+        # the score follows the votes read back, not the stale ones
+        score = Feed.score(page_views=self.page_views,
+                           ups=votes,
+                           downs=self.down_votes,
+                           date=self.created_at)
+        Post.query.filter_by(id=self.id).update({Post.score: score},
+                                                synchronize_session=False)
+
+        # reflect the new values without flagging the instance as dirty
+        set_committed_value(self, '_likes', likes)
+        set_committed_value(self, '_votes', votes)
+        set_committed_value(self, '_votes_version', version)
+        set_committed_value(self, 'score', score)
+        set_committed_value(self, 'modified_at', modified_at)
+
+        Ranking.update(self)
+        return self
+
+    def recount_votes(self, count):
+        """Sets the likes and votes to `count`, a subquery counting the votes
+        of the post, so the count is taken when the row is written."""
+        from app.models import Feed, Ranking
+
+        Post.query.filter_by(id=self.id).update({Post._likes: count,
+                                                 Post._votes: count,
+                                                 Post._votes_version: Post._votes_version + 1},
+                                                synchronize_session=False)
+
+        # the update holds the row lock until the commit, the votes cast
+        # meanwhile wait for it and move the counters from these values
+        likes, votes, version = sa.session.query(Post._likes, Post._votes, Post._votes_version) \
+            .filter_by(id=self.id) \
+            .one()
+
+        score = Feed.score(page_views=self.page_views,
+                           ups=votes,
+                           downs=self.down_votes,
+                           date=self.created_at)
+        Post.query.filter_by(id=self.id).update({Post.score: score},
+                                                synchronize_session=False)
+
+        set_committed_value(self, '_likes', likes)
+        set_committed_value(self, '_votes', votes)
+        set_committed_value(self, '_votes_version', version)
+        set_committed_value(self, 'score', score)
+
+        Ranking.update(self)
+        return self
+
     @property
     def encoded_id(self):
         return base64.b64encode(bytes('%s' % self.id)).encode('hex')
@@ -250,6 +473,53 @@ class Post(Base, sa.Model, ModelHelper):
     def decode_id(cls, encodedValue):
         return long(base64.b64decode(encodedValue.decode('hex')))
 
+    @classmethod
+    def make_excerpt(cls, value, length):
+        if not value:
+            return u''
+        return Markup(value).striptags()[:length]
+
+    @classmethod
+    def preload(cls, posts):
+        """Resolves the relationships used to serialize a page of posts.
+
+        Users, categories and pictures (covers and profile pictures) are
+        loaded with one IN query each instead of one query per post.
+        """
+        from app.models import User, Category, Picture
+
+        posts = list(posts)
+        loader = BatchLoader()
+
+        for post in posts:
+            loader.add(User, post.user_id)
+            loader.add(Category, post.category_id)
+            loader.add(Picture, post.cover_picture_id)
+
+        loader.load()
+
+        users = loader.values(User)
+
+        for user in users:
+            loader.add(Picture, user.profile_picture_id)
+
+        loader.load()
+
+        for user in users:
+            user._profile_picture = loader.get(Picture, user.profile_picture_id)
+
+        for post in posts:
+            set_committed_value(post, 'user', loader.get(User, post.user_id))
+            set_committed_value(post, 'category', loader.get(Category, post.category_id))
+            post._cover_picture = loader.get(Picture, post.cover_picture_id)
+
+        return posts
+
+    @classmethod
+    def list_query(cls):
+        """Query for list pages, the `attr` blob (story bodies) is not loaded."""
+        return cls.query.options(defer(cls.attr))
+
     @classmethod
     def minimun_date(cls):
         return datetime.datetime(1, 1, 1, 0, 0, 0, 0)
@@ -275,7 +545,7 @@ class Post(Base, sa.Model, ModelHelper):
                       status=POST_PUBLIC,
                       orderby='created_at',
                       desc=True):
-        query = cls.query.filter_by(user_id=user_id, status=status)
+        query = cls.list_query().filter_by(user_id=user_id, status=status)
 
         count = query.count()
         records = []
@@ -307,7 +577,7 @@ class Post(Base, sa.Model, ModelHelper):
         if not category_ids:
             return [], 0
 
-        query = cls.query.filter(cls.category_id.in_(
+        query = cls.list_query().filter(cls.category_id.in_(
             category_ids), cls.status == status)
         count = query.count()
         records = []
@@ -0,0 +1,3 @@
+# -*- coding: utf8 -*-
+
+from .search import StorySearch, SearchPosting, SearchDocument
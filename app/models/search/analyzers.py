@@ -0,0 +1,115 @@
+# -*- coding: utf8 -*-
+
+from jinja2 import Markup
+import re
+import unicodedata
+
+_WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+# hiragana, katakana, CJK ideographs and half-width katakana
+_CJK_RE = re.compile(u'([\u3040-\u30ff\u3400-\u4dbf\u4e00-\u9fff\uf900-\ufaff\uff66-\uff9f]+)')
+
+# voiced and semi-voiced sound marks of the kana
+_KANA_MARKS = frozenset(u'\u3099\u309a')
+
+STOPWORDS = {
+    'en': u'a an and are as at be but by for from has have he her his i if in '
+          u'into is it its me my no not of on or our she so than that the their '
+          u'them then there these they this to was we were what when which who '
+          u'will with you your',
+    'es': u'a al como con de del el ella en es esta este fue ha la las le lo los '
+          u'mas me mi no o para pero por que se si sin sobre su sus te tu un una '
+          u'uno y ya yo',
+    'fr': u'a au aux avec ce ces dans de des du elle en est et il ils je la le '
+          u'les leur lui ma mais me mes ne nous on ou par pas pour qu que qui sa '
+          u'se ses son sur ta te tu un une vous',
+    'ja': u''
+}
+
+
+class Analyzer(object):
+    """Turns the text of a story into the terms of the search index.
+
+    Tags are stripped, words lower cased and folded to their unaccented
+    form, stop words dropped and the plural `s` of the longer words removed.
+    """
+    # length of the term column
+    MAX_LENGTH = 64
+
+    def __init__(self, stopwords=u'', min_length=2):
+        self.stopwords = frozenset(self.fold(word) for word in stopwords.split())
+        self.min_length = min_length
+
+    def terms(self, text):
+        if not text:
+            return []
+
+        text = Markup(text).striptags() if u'<' in text else text
+        return self.tokens(self.fold(text))
+
+    def tokens(self, text):
+        terms = []
+
+        for word in _WORD_RE.findall(text):
+            if len(word) < self.min_length or word in self.stopwords:
+                continue
+            terms.append(self.stem(word)[:self.MAX_LENGTH])
+
+        return terms
+
+    def stem(self, word):
+        if len(word) > 3 and word.endswith(u's') and not word.endswith(u'ss'):
+            return word[:-1]
+        return word
+
+    @classmethod
+    def fold(cls, text):
+        text = unicodedata.normalize('NFKD', unicode(text).lower())
+        return u''.join(c for c in text if not unicodedata.combining(c))
+
+
+class CJKAnalyzer(Analyzer):
+    """Analyzer of the languages written without spaces.
+
+    Runs of CJK characters are indexed as overlapping bigrams, a query then
+    matches any substring of two characters or more. The rest of the text
+    goes through the default analyzer.
+    """
+
+    def tokens(self, text):
+        terms = []
+
+        for i, part in enumerate(_CJK_RE.split(text)):
+            # the split alternates the text around the runs and the runs
+            if i % 2 == 0:
+                terms.extend(super(CJKAnalyzer, self).tokens(part))
+            elif len(part) == 1:
+                terms.append(part)
+            else:
+                terms.extend(part[j:j + 2] for j in range(len(part) - 1))
+
+        return terms
+
+    @classmethod
+    def fold(cls, text):
+        # accents are dropped as by the default analyzer but the voicing
+        # marks of the kana, composed back with their kana by NFC
+        text = unicodedata.normalize('NFKD', unicode(text).lower())
+        text = u''.join(c for c in text if c in _KANA_MARKS or not unicodedata.combining(c))
+        return unicodedata.normalize('NFC', text)
+
+
+_CJK_LANGUAGES = ('ja', 'zh', 'cn', 'ko')
+
+_analyzers = {}
+
+
+def get_analyzer(lang):
+    """Analyzer of the language, one of `config.LANGUAGES`."""
+    analyzer = _analyzers.get(lang)
+
+    if analyzer is None:
+        cls = CJKAnalyzer if lang in _CJK_LANGUAGES else Analyzer
+        analyzer = _analyzers[lang] = cls(STOPWORDS.get(lang, u''))
+
+    return analyzer
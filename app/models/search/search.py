@@ -0,0 +1,224 @@
+# -*- coding: utf8 -*-
+
+from app import sa
+from app.models import Base, Post
+from app.helpers import ModelHelper
+from analyzers import get_analyzer
+from collections import defaultdict
+import app
+import datetime
+import math
+
+
+class SearchPosting(Base, sa.Model, ModelHelper):
+    """Weighted frequency of a term in a story, a row of the inverted index."""
+
+    __tablename__ = 'search_postings'
+
+    term = sa.Column(sa.String(64, collation='utf8mb4_bin'), primary_key=True)
+    post_id = sa.Column(sa.Integer,
+                        sa.ForeignKey('posts.id',
+                                      ondelete='CASCADE',
+                                      onupdate='NO ACTION'),
+                        primary_key=True,
+                        index=True)
+    frequency = sa.Column(sa.Float, nullable=False)
+
+
+class SearchDocument(Base, sa.Model, ModelHelper):
+    """Indexed story with the weighted number of its terms."""
+
+    __tablename__ = 'search_documents'
+
+    post_id = sa.Column(sa.Integer,
+                        sa.ForeignKey('posts.id',
+                                      ondelete='CASCADE',
+                                      onupdate='NO ACTION'),
+                        primary_key=True,
+                        autoincrement=False)
+    lang = sa.Column(sa.String(4), nullable=False, index=True)
+    length = sa.Column(sa.Float, nullable=False)
+    indexed_at = sa.Column(sa.DateTime, default=datetime.datetime.utcnow)
+
+
+class StorySearch:
+    """Full-text search of the public stories.
+
+    The title, body and extra body of a story are analyzed with the
+    analyzer of its language into weighted terms stored in
+    `search_postings`. The index is updated with the story when it is
+    published, hidden or deleted (the foreign keys remove the rows of a
+    deleted post). Queries are ranked with BM25 over the terms matched.
+    """
+    # weight of a term by the field it was found in
+    FIELD_WEIGHTS = (('title', 3.0), ('body', 1.5), ('extra_body', 1.0))
+
+    # BM25 parameters
+    K1 = 1.2
+    B = 0.75
+
+    MAX_QUERY_TERMS = 16
+
+    CACHE_STATS = 'stamps/search.stats'
+    CACHE_STATS_EXPIRED_AT = 300
+
+    @classmethod
+    def analyze(cls, post):
+        """Returns the weighted frequencies of the terms of the post."""
+        analyzer = get_analyzer(post.lang)
+        frequencies = defaultdict(float)
+
+        for field, weight in cls.FIELD_WEIGHTS:
+            for term in analyzer.terms(getattr(post, field)):
+                frequencies[term] += weight
+
+        return frequencies
+
+    @classmethod
+    def update(cls, post, commit=True):
+        """Indexes the post when it is public, removes it otherwise."""
+        # concurrent updates of the post wait for each other here, or both
+        # would delete then insert the same rows
+        sa.session.query(Post.id).filter_by(id=post.id).with_for_update().first()
+
+        cls.remove(post.id, commit=False)
+
+        if post.status == Post.POST_PUBLIC:
+            frequencies = cls.analyze(post)
+
+            if frequencies:
+                sa.session.execute(SearchPosting.__table__.insert(),
+                                   [dict(term=term, post_id=post.id, frequency=frequency)
+                                    for term, frequency in frequencies.iteritems()])
+
+            sa.session.execute(SearchDocument.__table__.insert().values(
+                post_id=post.id,
+                lang=post.lang,
+                length=sum(frequencies.itervalues()),
+                indexed_at=datetime.datetime.utcnow()))
+
+        if commit:
+            sa.session.commit()
+
+    @classmethod
+    def remove(cls, post_id, commit=True):
+        SearchPosting.query.filter_by(post_id=post_id).delete(synchronize_session=False)
+        SearchDocument.query.filter_by(post_id=post_id).delete(synchronize_session=False)
+
+        if commit:
+            sa.session.commit()
+
+    @classmethod
+    def search(cls, keyword, lang='en', page=1, limit=20, same_lang=False):
+        """Returns the public posts matching the terms of the keyword, the
+        best ranked first, and the number of posts matching.
+
+        The stories of each language are matched with the keyword analyzed
+        by the analyzer of that language, the way they were indexed.
+        `same_lang` restricts the results to the stories written in `lang`.
+        """
+        languages = [lang] if same_lang else [code for code, name in Post.get_language_list()]
+        terms_by_lang = dict((code, list(set(get_analyzer(code).terms(keyword)))[:cls.MAX_QUERY_TERMS])
+                             for code in languages)
+        terms = set(term for lang_terms in terms_by_lang.itervalues() for term in lang_terms)
+
+        if not terms:
+            return [], 0
+
+        documents, average_length = cls.stats()
+
+        document_frequencies = dict(
+            sa.session.query(SearchPosting.term, sa.func.count())
+            .filter(SearchPosting.term.in_(terms))
+            .group_by(SearchPosting.term))
+
+        if not document_frequencies:
+            return [], 0
+
+        # the cached stats may lag behind the stories indexed since
+        documents = max(documents, max(document_frequencies.itervalues()))
+
+        idf = sa.case([(SearchPosting.term == term, cls._idf(documents, frequency))
+                       for term, frequency in document_frequencies.iteritems()],
+                      else_=0)
+
+        # BM25 term frequency, saturated and normalized by the story length
+        normalized = SearchPosting.frequency * (cls.K1 + 1) / (
+            SearchPosting.frequency +
+            cls.K1 * (1 - cls.B + cls.B * SearchDocument.length / average_length))
+
+        matches = []
+        for code, lang_terms in terms_by_lang.iteritems():
+            lang_terms = [term for term in lang_terms if term in document_frequencies]
+
+            if lang_terms:
+                matches.append(sa.and_(SearchDocument.lang == code,
+                                       SearchPosting.term.in_(lang_terms)))
+
+        query = sa.session.query(SearchPosting.post_id) \
+            .join(SearchDocument, SearchDocument.post_id == SearchPosting.post_id) \
+            .filter(sa.or_(*matches))
+
+        total = query.with_entities(sa.func.count(sa.distinct(SearchPosting.post_id))).scalar()
+
+        if not total:
+            return [], 0
+
+        score = sa.func.sum(idf * normalized).label('score')
+        rows = query.add_columns(score) \
+            .group_by(SearchPosting.post_id) \
+            .order_by(score.desc(), SearchPosting.post_id.desc()) \
+            .limit(limit) \
+            .offset((page - 1) * limit) \
+            .all()
+
+        ids = [row.post_id for row in rows]
+        posts = dict((post.id, post) for post in
+                     Post.list_query().filter(Post.id.in_(ids),
+                                              Post.status == Post.POST_PUBLIC))
+
+        return [posts[id] for id in ids if id in posts], total
+
+    @classmethod
+    def stats(cls):
+        """Number of indexed stories and their average length, cached."""
+        stats = app.cache.get(cls.CACHE_STATS)
+
+        if stats is None:
+            count, length = sa.session.query(sa.func.count(),
+                                             sa.func.avg(SearchDocument.length)).one()
+            stats = (count or 0, float(length or 0) or 1.0)
+            app.cache.set(cls.CACHE_STATS, stats, cls.CACHE_STATS_EXPIRED_AT)
+
+        return stats
+
+    @classmethod
+    def rebuild(cls, batch=200):
+        """Indexes every post again, returns the number of public posts."""
+        indexed = 0
+        last_id = 0
+
+        while True:
+            posts = Post.query \
+                .filter(Post.id > last_id) \
+                .order_by(Post.id) \
+                .limit(batch) \
+                .all()
+
+            if not posts:
+                break
+
+            for post in posts:
+                cls.update(post, commit=False)
+                indexed += post.status == Post.POST_PUBLIC
+
+            sa.session.commit()
+            last_id = posts[-1].id
+
+        app.cache.delete(cls.CACHE_STATS)
+        return indexed
+
+    @classmethod
+    def _idf(cls, documents, frequency):
+        # BM25 idf, kept positive for the terms found in most stories
+        return math.log(1 + (documents - frequency + 0.5) / (frequency + 0.5))
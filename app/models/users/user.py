@@ -2,6 +2,7 @@
 
 from flask_login import UserMixin, current_user
 from werkzeug.security import generate_password_hash, check_password_hash
+from sqlalchemy.orm import defer
 from app import sa
 from app.models import Base, Post
 from role import Role
@@ -114,14 +115,17 @@ class User(Base, sa.Model, ModelHelper, UserMixin):
 
     @profile_picture_id.setter
     def profile_picture_id(self, value):
+        self.__dict__.pop('_profile_picture', None)
         return self.set_attribute('profile_picture_id', value)
 
     @property
     def profile_picture(self):
         if not self.profile_picture_id:
             return None
-        from app.models import Picture
-        return Picture.get_by_id(self.profile_picture_id)
+        if not hasattr(self, '_profile_picture'):
+            from app.models import Picture
+            self._profile_picture = Picture.get_by_id(self.profile_picture_id)
+        return self._profile_picture
 
     @property
     def profile_picture_url(self):
@@ -158,6 +162,7 @@ class User(Base, sa.Model, ModelHelper, UserMixin):
         total = self.posts.count()
 
         posts = self.posts \
+            .options(defer(Post.attr)) \
             .filter_by(status=status) \
             .order_by(sa.text("created_at DESC")) \
             .offset((page - 1) * limit) \
@@ -1,3 +1,4 @@
 # -*- coding: utf8 -*-
 
 from .vote import Vote
+from . import tasks  # noqa
@@ -0,0 +1,26 @@
+# -*- coding: utf8 -*-
+
+from celery.utils.log import get_task_logger
+from app.helpers.tasks import task_handler
+import app
+
+
+@task_handler
+def reconcile_votes():
+    """Fixes the likes of the posts which drifted from their votes."""
+    from .vote import Vote
+
+    logger = get_task_logger(__name__)
+    mismatches = Vote.reconcile(fix=True)
+
+    if mismatches:
+        logger.warning('[reconcile_votes] %s posts fixed', len(mismatches))
+
+
+# runs with the beat of the worker (celery worker --beat)
+app.mq.conf.beat_schedule = dict(app.mq.conf.beat_schedule or {}, **{
+    'reconcile-votes': {
+        'task': reconcile_votes.name,
+        'schedule': app.app.config.get('VOTES_RECONCILE_INTERVAL', 3600)
+    }
+})
@@ -36,16 +36,36 @@ class Vote(Base, sa.Model, ModelHelper):
     def votes_by_user_id(cls, user_id, kind=KIND_STORY):
         return cls.query.filter_by(user_id=user_id, kind=kind)
 
+    @classmethod
+    def voted_target_ids(cls, user_id, target_ids, kind=KIND_STORY):
+        """Returns which of the targets the user voted on, a single lookup
+        of the (user_id, kind) index restricted to the given ids."""
+        if not target_ids:
+            return set()
+
+        rows = cls.votes_by_user_id(user_id, kind) \
+            .with_entities(cls.target_id) \
+            .filter(cls.target_id.in_(target_ids)) \
+            .all()
+
+        return set(row.target_id for row in rows)
+
     @classmethod
     def get_target(cls, target_id, kind=KIND_STORY):
         if cls.KIND_STORY == kind:
-            return Post.get(target_id)
+            return Post.get_by_id(target_id)
         return None
 
     @classmethod
     def cast_vote(cls, user_id, target_id, kind=KIND_STORY, commit=True):
-        is_upvote, count = False, 0
-
+        """Toggles the vote of the user on the target.
+
+        The vote is deleted, or inserted when there was none, with a single
+        statement each and the likes of the target move by the number of
+        rows changed (`Post.add_votes`), without counting the votes nor
+        rewriting the post. Returns `(is_upvote, likes, delta)`, `delta` is
+        0 when a concurrent request of the user changed the vote first.
+        """
         try:
             # create a new savepoint in db
             sa.session.begin_nested()
@@ -55,26 +75,27 @@ class Vote(Base, sa.Model, ModelHelper):
             if not target:
                 raise Exception('ERROR_VOTE_TARGET_NOT_FOUND')
 
-            count = cls.query \
-                .filter_by(target_id=target_id, kind=kind) \
-                .count()
-
-            vote = cls.get((user_id, target_id))
+            deleted = cls.query \
+                .filter_by(user_id=user_id, target_id=target_id) \
+                .delete(synchronize_session=False)
 
-            is_upvote = vote is None
+            is_upvote = not deleted
 
             if is_upvote:
-                vote = cls.create(user_id=user_id,
-                                  target_id=target_id,
-                                  kind=kind)
-                vote.save(commit=False)
-                count += 1
+                now = datetime.datetime.utcnow()
+                # IGNORE, a concurrent vote of the same user may insert first
+                delta = sa.session.execute(
+                    cls.__table__.insert().prefix_with('IGNORE').values(
+                        user_id=user_id,
+                        target_id=target_id,
+                        kind=kind,
+                        created_at=now,
+                        modified_at=now)).rowcount
             else:
-                vote.remove(commit=False)
-                count -= 1
+                delta = -deleted
 
-            target.likes = count if count > -1 else 0
-            target.save(commit=False)
+            if delta:
+                target.add_votes(delta)
 
             # commit fpr the current savepoint in db
             sa.session.commit()
@@ -86,4 +107,51 @@ class Vote(Base, sa.Model, ModelHelper):
         if commit:
             sa.session.commit()
 
-        return is_upvote, count
+        return is_upvote, target.likes, delta
+
+    @classmethod
+    def reconcile(cls, fix=False, batch=1000, kind=KIND_STORY):
+        """Compares the likes of the posts with the count of their votes.
+
+        The counters move by deltas, a failed or lost update makes them
+        drift; with `fix` the likes are set back to the count of votes,
+        one post per transaction to keep its row locked briefly.
+        Returns the `(post_id, likes, votes)` mismatches found by the scan.
+        """
+        counts = dict(sa.session.query(cls.target_id, sa.func.count())
+                      .filter_by(kind=kind)
+                      .group_by(cls.target_id)
+                      .all())
+
+        mismatches = []
+        last_id = 0
+
+        while True:
+            rows = Post.query \
+                .with_entities(Post.id, Post._likes) \
+                .filter(Post.id > last_id) \
+                .order_by(Post.id) \
+                .limit(batch) \
+                .all()
+
+            if not rows:
+                break
+
+            # rows not backfilled yet keep their likes in `attr`
+            drifted = [(id, likes, counts.get(id, 0)) for id, likes in rows
+                       if likes is not None and likes != counts.get(id, 0)]
+
+            if fix:
+                for id, likes, count in drifted:
+                    # counted again by the update itself, the counts above
+                    # miss the votes cast while the posts were scanned
+                    count = sa.select([sa.func.count()]) \
+                        .where(sa.and_(cls.target_id == id, cls.kind == kind)) \
+                        .as_scalar()
+                    Post.get_by_id(id).recount_votes(count)
+                    sa.session.commit()
+
+            mismatches.extend(drifted)
+            last_id = rows[-1][0]
+
+        return mismatches
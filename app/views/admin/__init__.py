@@ -23,3 +23,7 @@ PostsView.register(app.app)
 # register the User module
 from users import UsersView  # noqa
 UsersView.register(app.app)
+
+# register the Cache module
+from cache import CacheView  # noqa
+CacheView.register(app.app)
@@ -0,0 +1,3 @@
+# -*- coding: utf8 -*-
+
+from index import CacheView  # noqa
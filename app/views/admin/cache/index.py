@@ -0,0 +1,19 @@
+# -*- coding: utf8 -*-
+
+from flask import abort
+from flask_login import current_user, login_required
+from flask_classy import FlaskView, route
+from app.helpers import render_json
+import app
+
+
+class CacheView(FlaskView):
+    route_base = '/mypage/cache'
+    decorators = [login_required]
+
+    @route('/stats', methods=['GET'])
+    def stats(self):
+        if not current_user.is_admin:
+            abort(403)
+
+        return render_json(stats=app.cache.cache_stats())
@@ -4,7 +4,7 @@ from flask import flash, redirect, url_for, request, abort
 from flask_login import current_user, login_required
 from flask_classy import FlaskView, route
 from flask_babel import gettext as _
-from app.models import Post, Picture, Feed
+from app.models import Post, Picture, Feed, Ranking
 from app.helpers import render_view
 from forms import PostForm
 
@@ -70,8 +70,11 @@ class PostsView(FlaskView):
 
         try:
             title = post.title
-            Post.delete(post.id)
+            id, category_id = post.id, post.category_id
+            Post.delete(id)
             Feed.clear_feed_cache()
+            Feed.invalidate_post(id, category_id)
+            Ranking.remove(id, commit=True)
             ret = request.values.get('return')
 
             flash(_('POST_DELETE_SUCESS', title=title))
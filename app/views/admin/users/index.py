@@ -5,9 +5,10 @@ from flask_login import login_user, logout_user, current_user, login_required
 from flask_classy import FlaskView, route
 from flask_babel import gettext as _, refresh
 from flask_paginate import Pagination
-from app.models import Post, User, Picture, Feed
+from app.models import Post, User, Picture, Feed, Ranking, StorySearch
 from app.helpers import render_view, send_email
 from forms import UserForm
+import app
 
 
 class UsersView(FlaskView):
@@ -196,6 +197,15 @@ class UsersView(FlaskView):
 
             post.save()
             Feed.clear_feed_cache()
+            Ranking.update(post, commit=True)
+
+            # the post is saved already, a search index failure must not fail it
+            try:
+                StorySearch.update(post)
+            except Exception as e:
+                app.sa.session.rollback()
+                app.app.logger.error(u'[StorySearch] error indexing the story %s, %s',
+                                     post.id, e, exc_info=True)
 
             if post.is_hidden:
                 flash(_('USER_POST_HIDE_SUCCESS'))
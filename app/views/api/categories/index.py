@@ -2,14 +2,20 @@
 
 from flask import request
 from flask_classy import FlaskView, route
-from app.helpers import render_json
+from app.helpers import render_json, conditional
 from app.models import Category
 
 
+def _categories_version():
+    # no last modification date, a removed category would not change it
+    return Category.version(), None
+
+
 class CategoriesApiView(FlaskView):
     route_base = '/api/categories'
     decorators = []
 
+    @conditional(_categories_version)
     def index(self):
         data = request.values
 
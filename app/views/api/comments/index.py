@@ -4,23 +4,44 @@ from flask import request, abort
 from flask_classy import FlaskView, route
 from flask_login import current_user, login_required
 from flask_babel import gettext as _
-from app.helpers import render_json, send_email
+from app.helpers import render_json, send_email, conditional
 from app.models import Comment, Post
 
 
+def _comments_version(post_id):
+    post = Post.get_by_id(post_id)
+
+    if not post:
+        return None
+
+    # no last modification date, a removed comment would not change it
+    return Comment.version_by_post(post_id), None
+
+
 class CommentsApiView(FlaskView):
     route_base = '/api/comments'
 
     @route('/post/<int:post_id>/items', methods=['GET'])
+    @conditional(_comments_version)
     def comments_by_post(self, post_id):
+        page = request.values.get('page', 1, int)
+        limit = request.values.get('limit', 20, int)
+
+        if page < 1 or not 0 < limit <= 100:
+            abort(409, 'API_ERROR_INVALID_PARAMETERS')
+
         post = Post.get_by_id(post_id)
 
         if not post:
             abort(404, 'API_ERROR_POST_NOT_FOUND')
 
-        comments = post.comment_list
+        comments, total = Comment.threads(post_id, page=page, limit=limit)
 
-        return render_json(comments=comments)
+        return render_json(comments=comments,
+                           total=total,
+                           page=page,
+                           limit=limit,
+                           comment_count=post.comment_count)
 
     @login_required
     def post(self):
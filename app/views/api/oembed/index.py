@@ -11,7 +11,7 @@ class OEmbedApiView(FlaskView):
     route_base = '/api/oembed'
 
     @route('/item', methods=['GET'])
-    @cache.cached(query_string=True, timeout=86400)
+    @cache.cached_swr(soft_timeout=86400, hard_timeout=86400 * 7)
     def get(self):
         data = request.values
         url = data.get('url', '', unicode)
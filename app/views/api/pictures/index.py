@@ -3,14 +3,24 @@
 from flask import request, abort
 from flask_login import current_user, login_required
 from flask_classy import FlaskView, route
-from app.helpers import render_json
+from app.helpers import render_json, conditional
 from app.models import Picture, Post
 
 
+def _picture_version(id):
+    picture = Picture.get_by_id(id)
+
+    if not picture:
+        return None
+
+    return (picture.modified_at,), picture.modified_at
+
+
 class PicturesApiView(FlaskView):
     route_base = '/api/pictures'
 
     @route('/item/<int:id>', methods=['GET'])
+    @conditional(_picture_version)
     def item(self, id):
         picture = Picture.get_by_id(id)
 
@@ -2,39 +2,100 @@
 
 from flask import url_for, request, abort
 from flask_login import current_user, login_required
+from flask_babel import get_locale
 from flask_classy import FlaskView, route
-from app.helpers import render_json
-from app.models import Post, Feed, Vote
+from app.helpers import render_json, serialize, conditional
+from app.models import Post, Feed, Vote, Ranking, StorySearch
 from models import StoryView
-from app import cache
 from flask_socketio import emit
+import app
+
+
+def _story_version(id):
+    story = Post.get_by_id(id)
+
+    if story is None or story.is_hidden:
+        return None
+
+    last_modified = story.modified_at
+
+    if story.user and story.user.modified_at > last_modified:
+        last_modified = story.user.modified_at
+
+    return story.version, last_modified
+
+
+def _index_story(story):
+    # the story is saved already, a search index failure must not fail it
+    try:
+        StorySearch.update(story)
+    except Exception as e:
+        app.sa.session.rollback()
+        app.app.logger.error(u'[StorySearch] error indexing the story %s, %s',
+                             story.id, e, exc_info=True)
 
 
 class StoriesApiView(FlaskView):
     route_base = '/api/stories'
     formatter = None
 
-    @cache.cached(
-        query_string=True,
-        timeout=Feed.CACHE_FEED_EXPIRED_AT,
-        forced_update=Feed.forced_update_posts
-    )
     def index(self):
         data = request.values
         page = data.get('page', 1, int)
         limit = data.get('limit', 5, int)
         category_id = data.get('category', 0, int)
+        after = data.get('after', None, unicode)
+
+        if after and Feed.decode_cursor(after) is None:
+            abort(400, 'API_ERROR_INVALID_CURSOR')
+
+        cached, owns_lock = Feed.get_feed_page()
+
+        if cached is not None:
+            return render_json(**cached)
+
+        # the lock taken by get_feed_page is released even when the page
+        # fails to build, a lock held by another worker is left alone
+        try:
+            # the presence of `after` switches the feed to cursor pagination
+            if after is not None:
+                payload = self._index_after(after,
+                                            category_id=category_id,
+                                            limit=limit)
+                first_page = not after
+            else:
+                posts, total = Feed.posts(category_id=category_id,
+                                          page=page,
+                                          limit=limit)
 
-        posts, total = Feed.posts(category_id=category_id,
-                                  page=page,
-                                  limit=limit)
+                payload = dict(stories=map(self.clean_story, Post.preload(posts)),
+                               total=total,
+                               page=page,
+                               limit=limit)
+                first_page = page <= 1
 
-        stories = map(self.clean_story, posts)
+            payload = serialize(payload)
 
-        return render_json(stories=stories,
-                           total=total,
-                           page=page,
-                           limit=limit)
+            Feed.set_feed_page(payload,
+                               [story['id'] for story in payload['stories']],
+                               category_id=category_id,
+                               first_page=first_page)
+
+            return render_json(**payload)
+        finally:
+            if owns_lock:
+                Feed.release_feed_page()
+
+    def _index_after(self, after, category_id=0, limit=5):
+        posts, next_cursor = Feed.posts_after(category_id=category_id,
+                                              after=Feed.decode_cursor(after),
+                                              limit=limit)
+
+        return dict(stories=map(self.clean_story, Post.preload(posts)),
+                    total=Feed.total_posts(category_id=category_id),
+                    after=after,
+                    next=next_cursor,
+                    limit=limit)
 
     @route('/drafts', methods=['GET'])
     @login_required
@@ -48,11 +109,12 @@ class StoriesApiView(FlaskView):
                                           page=page,
                                           status=Post.POST_DRAFT_2)
 
-        return render_json(stories=posts,
+        return render_json(stories=map(self.clean_story, Post.preload(posts)),
                            total=total,
                            page=page,
                            limit=limit)
 
+    @conditional(_story_version)
     def get(self, id):
         story = Post.get_by_id(id)
 
@@ -71,13 +133,37 @@ class StoriesApiView(FlaskView):
         if not story.can_edit():
             abort(404, 'API_ERROR_POST_NOT_FOUND')
 
+        category_id = story.category_id
         Post.delete(id)
 
         # clear related cache objects
-        Feed.clear_cached_posts()
+        Feed.invalidate_post(id, category_id)
+        Ranking.remove(id, commit=True)
 
         return render_json(status=204)
 
+    @route('/search', methods=['GET'])
+    def search(self):
+        data = request.values
+        keyword = data.get('q', u'', unicode).strip()
+        lang = data.get('lang', None, str) or str(get_locale())
+        page = data.get('page', 1, int)
+        limit = data.get('limit', 20, int)
+
+        if not keyword or page < 1 or not 0 < limit <= 100:
+            abort(409, 'API_ERROR_INVALID_PARAMETERS')
+
+        posts, total = StorySearch.search(keyword,
+                                          lang=lang,
+                                          page=page,
+                                          limit=limit,
+                                          same_lang=data.get('same_lang', 0, int) == 1)
+
+        return render_json(stories=map(self.clean_story, Post.preload(posts)),
+                           total=total,
+                           page=page,
+                           limit=limit)
+
     @route('/last-draft', methods=['GET'])
     @login_required
     def last_draft(self):
@@ -117,7 +203,10 @@ class StoriesApiView(FlaskView):
         story.save()
 
         # clear related cache objects
-        Feed.clear_cached_posts()
+        Feed.invalidate_post(story.id)
+        # a story back to draft leaves the ranking and the search index
+        Ranking.update(story, commit=True)
+        _index_story(story)
 
         return render_json(story=story)
 
@@ -142,7 +231,9 @@ class StoriesApiView(FlaskView):
         story.save()
 
         # clear related cache objects
-        Feed.clear_cached_posts()
+        Feed.invalidate_post(story.id, story.category_id)
+        Ranking.update(story, commit=True)
+        _index_story(story)
 
         return render_json(story=story)
 
@@ -163,10 +254,13 @@ class StoriesApiView(FlaskView):
         if story.save_count <= 0:
             story.created_at = Post.current_date()
         story.save_count += 1
+        # the score depends on the publishing date
+        story.update_score()
         story.save()
 
         # clear related cache objects
-        Feed.clear_cached_posts()
+        Feed.invalidate_post(story.id, story.category_id)
+        _index_story(story)
 
         return render_json(story=story,
                            redirect_to=url_for('story.show', id=story.id))
@@ -25,8 +25,9 @@ class StoryView(object):
     def __init__(self, story):
         self.id = story.id
         self.title = story.title
-        self.body = story.body
-        self.extra_body = story.extra_body
+        # list projection, plain text previews instead of the full bodies
+        self.body = story.summary
+        self.extra_body = story.excerpt
         self.user = ProfileView(story.user)
         if story.anonymous:
             self.user = None
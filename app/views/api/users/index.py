@@ -3,7 +3,8 @@
 from flask import request, abort
 from flask_login import current_user, login_required
 from flask_classy import FlaskView, route
-from app.helpers import render_json
+from app.helpers import render_json, render_json_stream, encode_ids
+from app.helpers.json.ids import ENCODINGS
 from app.models import Vote, User
 from app import cache
 
@@ -21,6 +22,33 @@ class UsersApiView(FlaskView):
     @login_required
     def stories_votes(self):
         user = current_user._get_current_object()
-        records = Vote.votes_by_user_id(user.id)
-        votes = map(lambda x: x.target_id, records)
-        return render_json(votes=votes)
+        records = Vote.votes_by_user_id(user.id) \
+            .with_entities(Vote.target_id) \
+            .yield_per(1000)
+        encoding = request.values.get('encoding', 'list')
+
+        if encoding not in ENCODINGS:
+            abort(409, 'API_ERROR_INVALID_PARAMETERS')
+
+        if encoding == 'list':
+            return render_json_stream('votes', (x.target_id for x in records))
+
+        return render_json(votes=encode_ids((x.target_id for x in records), encoding),
+                           encoding=encoding)
+
+    @route('/stories/votes/state', methods=['GET'])
+    @login_required
+    def stories_votes_state(self):
+        """Vote state of the user for the stories on screen, `ids` is a
+        comma separated list of at most 100 story ids."""
+        try:
+            ids = [int(id) for id in request.values.get('ids', '').split(',') if id]
+        except ValueError:
+            abort(409, 'API_ERROR_INVALID_PARAMETERS')
+
+        if not 0 < len(ids) <= 100:
+            abort(409, 'API_ERROR_INVALID_PARAMETERS')
+
+        votes = Vote.voted_target_ids(current_user.id, ids)
+
+        return render_json(votes=dict((id, id in votes) for id in ids))
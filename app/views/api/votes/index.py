@@ -3,9 +3,9 @@
 from flask import request, abort
 from flask_login import current_user, login_required
 from flask_classy import FlaskView, route
-from flask_socketio import emit
 from app.helpers import render_json
-from app.models import Vote, Post
+from app.models import Vote, Post, Feed
+from app.events.broadcast import votes
 from app import cache
 
 
@@ -38,18 +38,24 @@ class VotesApiView(FlaskView):
         if story is None or story.is_hidden:
             abort(404, 'API_ERROR_POST_NOT_FOUND')
 
-        is_upvote, count = Vote.cast_vote(current_user.id,
-                                          target_id,
-                                          Vote.KIND_STORY)
+        is_upvote, count, delta = Vote.cast_vote(current_user.id,
+                                                 target_id,
+                                                 Vote.KIND_STORY)
+
+        # clear related cache objects
+        Feed.invalidate_post(target_id)
 
         vote = {
             'target': data.get('target'),
             'target_id': target_id,
             'user_id': current_user.id,
             'count': count,
+            'version': story.votes_version,
             'is_upvote': is_upvote
         }
 
-        emit('vote_story_results', vote, broadcast=True)
+        # nothing changed when a concurrent request of the user won
+        if delta:
+            votes.add(target_id, count, delta, story.votes_version)
 
         return render_json(vote=vote)
@@ -2,6 +2,8 @@
 
 from flask import render_template
 from flask_classy import FlaskView, route
+from app.models import Feed
+import app
 
 
 class PagesView(FlaskView):
@@ -9,10 +11,12 @@ class PagesView(FlaskView):
     route_base = ''
 
     @route('', endpoint='index')
+    @app.cache.cached_page(Feed.version)
     def index(self):
         return render_template('main/pages/home.html')
 
     @route('/latest', endpoint='latest')
+    @app.cache.cached_page(Feed.version)
     def latest(self):
         return render_template('main/pages/latest.html')
 
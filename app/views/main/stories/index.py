@@ -1,20 +1,34 @@
 # -*- coding: utf8 -*-
 
-from flask import render_template, url_for, abort, send_file, session, flash, redirect
+from flask import render_template, url_for, abort, session, flash, redirect, Response
 from flask_login import current_user, login_required
 from flask_classy import FlaskView, route
 from flask_babel import gettext as _
-from app.models import Post, Feed, Category, Comment
+from app.models import Post, Feed, Category, Comment, PageViews
 from app.helpers import send_email, render_view, nocache
 from forms import CommentForm
 import datetime
 import config
+import app
+
+with open(config.APP_BASE_PATH + '/static/images/counter.gif', 'rb') as f:
+    COUNTER_GIF = f.read()
+
+
+def _story_page_version(id):
+    post = Post.get_by_id(id)
+
+    if post is None or post.is_hidden:
+        return None
+
+    return post.version, Comment.version_by_post(id), Feed.version(id)
 
 
 class StoriesView(FlaskView):
     route_base = '/stories'
 
     @route('/<int:id>', endpoint='story.show')
+    @app.cache.cached_page(_story_page_version)
     def show(self, id):
         post = Post.get_by_id(id)
 
@@ -125,23 +139,15 @@ class StoriesView(FlaskView):
     def count_page_view(self, post_id):
 
         id = Post.decode_id(post_id)
-        post = Post.get_by_id(id)
 
-        try:
-            key = u'counter_post_%s' % id
-            count_time = float(session[key]) if key in session else 0
-
-            # Increase pageviews in 1 hour
-            if Feed.epoch_seconds(datetime.datetime.now()) > count_time:
-                Post.begin_transaction()
-                post.update_score(page_view=1)
-                post.save()
-                Post.commit_transaction()
-                seconds = datetime.datetime.now() + datetime.timedelta(hours=8)
-                session[key] = Feed.epoch_seconds(seconds)
+        key = u'counter_post_%s' % id
+        count_time = float(session[key]) if key in session else 0
 
-        except Exception as e:
-            Post.rollback_transaction()
-            raise e
+        # Increase pageviews in 1 hour
+        if Feed.epoch_seconds(datetime.datetime.now()) > count_time:
+            # buffered, the page views are written in batches
+            PageViews.add(id)
+            seconds = datetime.datetime.now() + datetime.timedelta(hours=8)
+            session[key] = Feed.epoch_seconds(seconds)
 
-        return send_file(config.APP_BASE_PATH + '/static/images/counter.gif', mimetype='image/gif')
+        return Response(COUNTER_GIF, mimetype='image/gif')
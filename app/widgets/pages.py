@@ -8,12 +8,13 @@ import app
 def lp_home(language='en'):
     key = u'lp_home.%s' % (language)
 
-    fragment = app.cache.get(key)
+    fragment = app.cache.get_tiered(key, namespace=app.cache.WIDGETS_NAMESPACE)
 
     if not fragment:
         fragment = render_template('widgets/pages/_lp_home.html',
                                    language=language)
-        app.cache.set(key, fragment, 3600 * 24 * 7)
+        app.cache.set_tiered(key, fragment, 3600 * 24 * 7,
+                             namespace=app.cache.WIDGETS_NAMESPACE)
 
     return fragment
 
@@ -22,11 +23,12 @@ def lp_home(language='en'):
 def lp_head(language='en'):
     key = u'lp_head.%s' % (language)
 
-    fragment = app.cache.get(key)
+    fragment = app.cache.get_tiered(key, namespace=app.cache.WIDGETS_NAMESPACE)
 
     if not fragment:
         fragment = render_template('widgets/pages/_lp_head.html',
                                    language=language)
-        app.cache.set(key, fragment, 3600 * 24)
+        app.cache.set_tiered(key, fragment, 3600 * 24,
+                             namespace=app.cache.WIDGETS_NAMESPACE)
 
     return fragment
@@ -26,6 +26,7 @@ def story_list_by_category(language='en', category_slugs=None):
             category_ids.append(category.id)
 
     stories, count = Post.posts_by_categories(category_ids, limit=3)
+    stories = Post.preload(stories)
     return render_template('widgets/stories/_list_by_category.html',
                            stories=stories,
                            count=count,
@@ -36,11 +37,12 @@ def story_list_by_category(language='en', category_slugs=None):
 def header_scripts(language='en'):
     key = u'header_scripts.%s' % (language)
 
-    fragment = app.cache.get(key)
+    fragment = app.cache.get_tiered(key, namespace=app.cache.WIDGETS_NAMESPACE)
 
     if not fragment:
         fragment = render_template('widgets/header/_scripts.html',
                                    language=language)
-        app.cache.set(key, fragment, 3600 * 24)
+        app.cache.set_tiered(key, fragment, 3600 * 24,
+                             namespace=app.cache.WIDGETS_NAMESPACE)
 
     return fragment
@@ -6,4 +6,7 @@ LOGS_PATH=${APP_DATA_PATH}/logs
 mkdir -p ${PICTURE_PATH}
 mkdir -p ${LOGS_PATH}
 
+# expired cache entries and sessions are removed aside from the app
+python command.py cache evict --every 300 &
+
 python run.py
@@ -7,6 +7,9 @@ mkdir -p ${APP_DATA_PATH}/logs/
 chown -R :celery ${APP_BASE_PATH}
 chown -R :celery ${APP_DATA_PATH}
 
-celery --app=app.mq worker \
+# the beat runs the periodic tasks (votes reconciliation), keep a single
+# worker started with it
+celery --app=app.mq worker --beat \
+	--schedule=${APP_DATA_PATH}/celerybeat-schedule \
 	--loglevel=DEBUG --logfile=${LOG_FILE_NAME} \
 	--uid=celery --gid=celery
@@ -0,0 +1,283 @@
+# -*- coding: utf8 -*-
+
+import click
+import timeit
+from app import app
+
+
+@click.group()
+def cli():
+    pass
+
+
+def _report(name, seconds, number):
+    click.echo('%-24s %8.3f ms/op' % (name, seconds * 1000.0 / number))
+
+
+def _story_page(size):
+    """Builds a feed page of transient stories, no database needed."""
+    from app.models import Post, User, Category, Picture
+    from app.views.api.stories.models import StoryView
+    import datetime
+
+    category = Category(id=1, name=u'Uncategorized', slug='uncategorized')
+    picture = Picture(id=1, user_id=1)
+    picture.name = 'cover.jpg'
+
+    stories = []
+    for id in range(1, size + 1):
+        user = User(id=id, email='user%s@headup.space' % id)
+        user.nickname = u'user%s' % id
+
+        post = Post(id=id, user_id=user.id, category_id=category.id,
+                    status=Post.POST_PUBLIC, lang='en', anonymous=0)
+        post.title = u'Story number %s' % id
+        post.body = u'<p>%s</p>' % (u'Lorem ipsum dolor sit amet. ' * 10)
+        post.extra_body = u'<p>%s</p>' % (u'Consectetur adipiscing elit. ' * 200)
+        post.created_at = post.modified_at = datetime.datetime.utcnow()
+        post.likes = id
+        post.user = user
+        post.category = category
+        post._cover_picture = picture
+        stories.append(StoryView(post))
+
+    return stories
+
+
+@cli.command()
+@click.option('--size', default=100, help='number of stories in the payload')
+@click.option('--number', default=200, help='number of encodings to time')
+def json(size, number):
+    """Compare HttpJsonEncoder with the compiled serializers."""
+    from flask import json as flask_json
+    from app.helpers import HttpJsonEncoder
+    from app.helpers.json.serializer import dumps
+    import datetime
+
+    with app.test_request_context():
+        payload = {
+            'status': True,
+            'datetime': datetime.datetime.utcnow(),
+            'data': {'stories': _story_page(size), 'total': size, 'page': 1, 'limit': size}
+        }
+
+        click.echo('Encoding a feed payload of %s stories, %s times.' % (size, number))
+
+        legacy = timeit.timeit(lambda: flask_json.dumps(payload, cls=HttpJsonEncoder),
+                               number=number)
+        _report('HttpJsonEncoder', legacy, number)
+
+        compiled = timeit.timeit(lambda: dumps(payload), number=number)
+        _report('compiled serializers', compiled, number)
+
+        click.echo('speedup: %.2fx' % (legacy / compiled))
+
+
+@cli.command()
+@click.option('--post-id', type=int, required=True, help='post receiving the votes')
+@click.option('--workers', default=8, help='number of concurrent voters')
+@click.option('--votes', default=50, help='number of votes cast by each voter')
+def votes(post_id, workers, votes):
+    """Cast concurrent votes on one post and check the likes afterwards.
+
+    Every voter toggles the vote of its own synthetic user, the votes are
+    removed and the likes reconciled at the end.
+    """
+    from app.models import Vote, Post
+    from app import sa
+    import threading
+    import time
+
+    first_user_id = 2 ** 30
+    errors = []
+
+    def voter(user_id):
+        with app.app_context():
+            for i in range(votes):
+                try:
+                    Vote.cast_vote(user_id, post_id)
+                except Exception as e:
+                    errors.append(e)
+            sa.session.remove()
+
+    with app.app_context():
+        likes_before = Post.get_by_id(post_id).likes
+
+    threads = [threading.Thread(target=voter, args=(first_user_id + i,))
+               for i in range(workers)]
+
+    started_at = time.time()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    seconds = time.time() - started_at
+
+    total = workers * votes
+    click.echo('%s votes by %s voters in %.2fs, %.1f votes/s, %s errors.' % (
+        total, workers, seconds, total / seconds, len(errors)))
+    _report('cast_vote', seconds / workers, votes)
+
+    with app.app_context():
+        # an odd number of toggles leaves the vote of the voter in place
+        expected = likes_before + (workers if votes % 2 else 0)
+        likes = Post.query.with_entities(Post._likes).filter_by(id=post_id).scalar()
+        click.echo('likes: %s expected: %s' % (likes, expected))
+
+        Vote.query.filter(Vote.target_id == post_id,
+                          Vote.user_id >= first_user_id).delete(synchronize_session=False)
+        sa.session.commit()
+
+        post = Post.get_by_id(post_id)
+        post.likes = post.votes = Vote.query.filter_by(target_id=post_id,
+                                                       kind=Vote.KIND_STORY).count()
+        post.update_score()
+        post.save()
+        click.echo('benchmark votes removed, likes back to %s.' % post.likes)
+
+
+@cli.command()
+@click.option('--clients', default=200, help='number of connected sockets')
+@click.option('--votes', default=2000, help='number of votes to broadcast')
+@click.option('--rate', default=500, help='votes per second')
+@click.option('--stories', default=20, help='number of stories receiving the votes')
+@click.option('--screen', default=5, help='number of stories watched by each socket')
+@click.option('--window', default=0.5, help='coalescing window in seconds')
+def broadcast(clients, votes, rate, stories, screen, window):
+    """Compare global vote broadcasts with the coalesced counts sent to the
+    story rooms.
+
+    The votes go through the broadcaster without touching the database, the
+    messages are counted on in-process test clients and the cpu time is the
+    one of this process, serializing and fanning out the messages.
+    """
+    from app import socketio
+    from app.events.broadcast import VoteBroadcaster
+    import random
+    import time
+
+    sockets = []
+    for i in range(clients):
+        socket = socketio.test_client(app)
+        socket.emit('watch_stories', {
+            'join': random.sample(range(1, stories + 1), min(screen, stories))})
+        sockets.append(socket)
+
+    def broadcast_all(target_id, count, delta, version):
+        # every vote to every socket, the way votes were sent before the rooms
+        socketio.emit('vote_story_results',
+                      {'target_id': target_id, 'count': count, 'version': version},
+                      namespace='/')
+
+    click.echo('%s votes at %s/s on %s stories, %s clients watching %s stories.' % (
+        votes, rate, stories, clients, screen))
+
+    modes = (('global', None),
+             ('rooms', VoteBroadcaster(0)),
+             ('rooms coalesced %ss' % window, VoteBroadcaster(window)))
+
+    for name, broadcaster in modes:
+        add = broadcaster.add if broadcaster is not None else broadcast_all
+
+        for socket in sockets:
+            socket.get_received()
+
+        cpu_started_at, started_at = time.clock(), time.time()
+
+        for i in range(votes):
+            add(random.randint(1, stories), i, 1, i)
+            socketio.sleep(1.0 / rate)
+
+        if broadcaster is not None:
+            broadcaster.flush()
+
+        cpu = time.clock() - cpu_started_at
+        elapsed = time.time() - started_at
+        messages = sum(len(socket.get_received()) for socket in sockets)
+
+        click.echo('%-24s %8d messages %10.1f messages/s %8.3fs cpu (%.0f%%)' % (
+            name, messages, messages / elapsed, cpu, cpu * 100.0 / elapsed))
+
+    for socket in sockets:
+        socket.disconnect()
+
+
+@cli.command()
+@click.option('--workers', default=2, help='number of Socket.IO processes')
+@click.option('--clients', default=100, help='number of clients, spread over the workers')
+@click.option('--messages', default=1000, help='number of messages to relay')
+@click.option('--stories', default=20, help='number of story rooms')
+@click.option('--port', default=5100, help='port of the first worker')
+def workers(workers, clients, messages, stories, port):
+    """Relay room messages to clients spread over several Socket.IO workers.
+
+    The messages are emitted from this process through
+    SOCKET_IO_MESSAGE_QUEUE, the way a vote cast on any worker is, and
+    counted on the clients once every worker delivered them.
+    """
+    from app.events.broadcast import story_room
+    from app.events.workers import start_workers
+    from flask_socketio import SocketIO
+    import socketio
+    import threading
+    import time
+
+    queue = app.config.get('SOCKET_IO_MESSAGE_QUEUE')
+
+    if not queue:
+        raise click.ClickException('SOCKET_IO_MESSAGE_QUEUE is required to relay the messages.')
+
+    try:
+        processes = start_workers(workers, '127.0.0.1', port)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+    # let the workers listen before connecting
+    time.sleep(2)
+
+    lock = threading.Lock()
+    received = [0]
+
+    def on_counts(data):
+        with lock:
+            received[0] += 1
+
+    sockets = []
+    watchers = [0] * stories
+    for i in range(clients):
+        client = socketio.Client(reconnection=False)
+        client.on('vote_story_counts', on_counts)
+        client.connect('http://127.0.0.1:%s' % (port + i % workers))
+        client.emit('watch_stories', {'join': [i % stories + 1]})
+        watchers[i % stories] += 1
+        sockets.append(client)
+
+    time.sleep(1)
+
+    # a write only client of the queue, like any worker relaying a vote
+    emitter = SocketIO(message_queue=queue,
+                       channel=app.config.get('SOCKET_IO_CHANNEL', 'flask-socketio'))
+    expected = sum(watchers[i % stories] for i in range(messages))
+
+    click.echo('%s messages to %s clients on %s workers, %s deliveries expected.' % (
+        messages, clients, workers, expected))
+
+    started_at = time.time()
+
+    for i in range(messages):
+        target_id = i % stories + 1
+        emitter.emit('vote_story_counts',
+                     {'counts': [{'target_id': target_id, 'count': i, 'delta': 1}]},
+                     room=story_room(target_id), namespace='/')
+
+    while received[0] < expected and time.time() - started_at < 60:
+        time.sleep(0.05)
+
+    seconds = time.time() - started_at
+    click.echo('%s/%s deliveries in %.2fs, %.1f messages/s relayed, %.1f deliveries/s.' % (
+        received[0], expected, seconds, messages / seconds, received[0] / seconds))
+
+    for client in sockets:
+        client.disconnect()
+
+    for process in processes:
+        process.terminate()
@@ -0,0 +1,100 @@
+# -*- coding: utf8 -*-
+
+import click
+import json
+from app import app
+
+
+@click.group()
+def cli():
+    pass
+
+
+@cli.command()
+@click.option('--as-json', is_flag=True, help='print the raw stats as json')
+def stats(as_json):
+    """Show the cache stats published by the running processes."""
+    stats = app.cache.cache_stats()
+
+    if stats is None:
+        click.echo('Cache stats are disabled, see CACHE_STATS_ENABLED.')
+        return
+
+    if as_json:
+        click.echo(json.dumps(stats, indent=2, sort_keys=True))
+        return
+
+    click.echo('%s processes reporting.' % stats['processes'])
+    click.echo('%-24s %10s %10s %8s %10s %10s %12s %10s' % (
+        'prefix', 'hits', 'misses', 'ratio', 'sets', 'evictions', 'bytes', 'mean ms'))
+
+    for prefix, row in sorted(stats['prefixes'].iteritems()):
+        click.echo('%-24s %10s %10s %8s %10s %10s %12s %10s' % (
+            prefix, row['hits'], row['misses'],
+            '-' if row['hit_ratio'] is None else '%.2f' % row['hit_ratio'],
+            row['sets'], row['evictions'], row['bytes'],
+            '-' if row['mean_ms'] is None else '%.3f' % row['mean_ms']))
+
+    for tier, row in sorted(stats['tiers'].iteritems()):
+        click.echo('%s: %s hits, %s misses' % (tier, row['hits'], row['misses']))
+
+
+@cli.command()
+@click.argument('namespace', default='widgets')
+def bump(namespace):
+    """Invalidate every key of a namespace, e.g. the widgets after a deploy."""
+    if not app.cache.enabled:
+        click.echo('Cache is disabled, nothing to invalidate.')
+        return
+
+    app.cache.bump_namespace(namespace)
+    click.echo('Namespace %s invalidated.' % namespace)
+
+
+
+def _filesystem_stores():
+    from app.helpers.cache import ShardedFileSystemCache, ShardedFileSystemSessionInterface
+
+    stores = []
+
+    if isinstance(app.cache.cache, ShardedFileSystemCache):
+        stores.append(('cache', app.cache.cache))
+
+    if isinstance(app.session_interface, ShardedFileSystemSessionInterface):
+        stores.append(('sessions', app.session_interface.cache))
+
+    return stores
+
+
+@cli.command()
+@click.option('--every', default=0, help='evict again every this many seconds, 0 to run once')
+def evict(every):
+    """Remove the expired and old entries of the filesystem cache and sessions.
+
+    Walking the stores stats every entry, run it as its own process, never
+    from the web or socket processes whose requests it would block.
+    """
+    import time
+
+    stores = _filesystem_stores()
+
+    if not stores:
+        raise click.ClickException('No sharded filesystem store is configured.')
+
+    while True:
+        for name, store in stores:
+            try:
+                removed = store.evict_exclusive()
+            except Exception as e:
+                app.logger.error(u'[cache evict] error evicting the %s, %s', name, e, exc_info=True)
+                continue
+
+            if removed is None:
+                click.echo('Another process is evicting the %s.' % name)
+            else:
+                click.echo('%s entries removed from the %s.' % (removed, name))
+
+        if not every:
+            break
+
+        time.sleep(every)
@@ -0,0 +1,55 @@
+# -*- coding: utf8 -*-
+
+import click
+from app import app
+
+
+@click.group()
+def cli():
+    pass
+
+
+def _thread_id(comment_id, parents):
+    """Top-level comment of the thread, 0 for top-level comments."""
+    thread_id, seen = comment_id, set()
+
+    while parents.get(thread_id) and thread_id not in seen:
+        seen.add(thread_id)
+        thread_id = parents[thread_id]
+
+    return 0 if thread_id == comment_id else thread_id
+
+
+@cli.command()
+@click.option('--batch', default=500, help='number of posts per transaction')
+def backfill(batch):
+    """Fill the thread of the comments and the comment count of the posts."""
+    from app.models import Post, Comment
+    from app import sa
+
+    total = 0
+
+    while True:
+        posts = Post.list_query() \
+            .filter(Post._comment_count.is_(None)) \
+            .order_by(Post.id) \
+            .limit(batch) \
+            .all()
+
+        if not posts:
+            break
+
+        for post in posts:
+            comments = Comment.query.filter_by(post_id=post.id).all()
+            parents = dict((c.id, c.comment_id) for c in comments)
+
+            for comment in comments:
+                comment.thread_id = _thread_id(comment.id, parents)
+
+            post._comment_count = len(comments)
+
+        sa.session.commit()
+        total += len(posts)
+        click.echo('%s posts backfilled...' % total)
+
+    click.echo('Backfill completed, %s posts updated.' % total)
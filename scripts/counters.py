@@ -0,0 +1,70 @@
+# -*- coding: utf8 -*-
+
+import click
+from app import app
+
+
+@click.group()
+def cli():
+    pass
+
+
+@cli.command()
+@click.option('--batch', default=500, help='number of posts per transaction')
+@click.option('--cleanup', is_flag=True, help='remove the counters from `attr` once copied')
+def backfill(batch, cleanup):
+    """Copy the post counters from `attr` to their own columns."""
+    from sqlalchemy import or_
+    from app.models import Post
+    from app import sa
+
+    pending = or_(*[getattr(Post, '_%s' % name).is_(None) for name in Post.COUNTERS])
+    # defaults of the getters, for the counters `attr` holds as None
+    defaults = {'page_views': 1}
+    total = 0
+    last_id = 0
+
+    while True:
+        posts = Post.query.filter(pending, Post.id > last_id) \
+            .order_by(Post.id) \
+            .limit(batch) \
+            .all()
+
+        if not posts:
+            break
+
+        for post in posts:
+            for name in Post.COUNTERS:
+                # the getter falls back to `attr` while the column is NULL
+                value = getattr(post, name)
+                setattr(post, name, defaults.get(name, 0) if value is None else value)
+            sa.session.add(post)
+            last_id = post.id
+
+        sa.session.commit()
+        total += len(posts)
+        click.echo('%s posts backfilled...' % total)
+
+    if cleanup:
+        last_id = 0
+
+        while True:
+            posts = Post.query.filter(Post.id > last_id) \
+                .order_by(Post.id) \
+                .limit(batch) \
+                .all()
+
+            if not posts:
+                break
+
+            for post in posts:
+                for name in Post.COUNTERS:
+                    if post.attr and name in post.attr:
+                        del post.attr[name]
+                last_id = post.id
+
+            sa.session.commit()
+
+        click.echo('Counters removed from `attr`.')
+
+    click.echo('Backfill completed, %s posts updated.' % total)
@@ -0,0 +1,26 @@
+"""post summary and excerpt
+
+Revision ID: 5d7c0a3e8f12
+Revises: 9e4b2d61a7c5
+Create Date: 2026-10-18 13:40:51.226931
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5d7c0a3e8f12'
+down_revision = '9e4b2d61a7c5'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # filled by `python command.py posts excerpts`, computed on save afterwards
+    op.add_column('posts', sa.Column('summary', sa.String(length=512), nullable=True))
+    op.add_column('posts', sa.Column('excerpt', sa.Text(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('posts', 'excerpt')
+    op.drop_column('posts', 'summary')
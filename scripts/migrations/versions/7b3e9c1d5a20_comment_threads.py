@@ -0,0 +1,31 @@
+"""comment threads and post comment count
+
+Revision ID: 7b3e9c1d5a20
+Revises: 5d7c0a3e8f12
+Create Date: 2026-10-18 16:12:37.418205
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '7b3e9c1d5a20'
+down_revision = '5d7c0a3e8f12'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # both are NULL until `python command.py comments backfill` fills them,
+    # the model falls back to the slower queries meanwhile
+    op.add_column('comments', sa.Column('thread_id', sa.Integer(), nullable=True))
+    op.create_index('idx_post_parent', 'comments', ['post_id', 'comment_id', 'id'], unique=False)
+    op.create_index('idx_post_thread', 'comments', ['post_id', 'thread_id'], unique=False)
+    op.add_column('posts', sa.Column('comment_count', sa.Integer(), nullable=True))
+
+
+def downgrade():
+    op.drop_column('posts', 'comment_count')
+    op.drop_index('idx_post_thread', table_name='comments')
+    op.drop_index('idx_post_parent', table_name='comments')
+    op.drop_column('comments', 'thread_id')
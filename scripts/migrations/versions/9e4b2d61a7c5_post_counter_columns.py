@@ -0,0 +1,41 @@
+"""post counter columns
+
+Revision ID: 9e4b2d61a7c5
+Revises: c3a1f7e2d9b4
+Create Date: 2026-10-18 11:02:13.504870
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '9e4b2d61a7c5'
+down_revision = 'c3a1f7e2d9b4'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # the columns are NULL until `python command.py counters backfill` copies
+    # the values from `attr`, the model reads `attr` meanwhile
+    op.add_column('posts', sa.Column('cover_picture_id', sa.Integer(), nullable=True))
+    op.add_column('posts', sa.Column('page_views', sa.Integer(), nullable=True))
+    op.add_column('posts', sa.Column('save_count', sa.Integer(), nullable=True))
+    op.add_column('posts', sa.Column('votes', sa.Integer(), nullable=True))
+    op.add_column('posts', sa.Column('down_votes', sa.Integer(), nullable=True))
+    op.add_column('posts', sa.Column('likes', sa.Integer(), nullable=True))
+    op.create_index(op.f('ix_posts_cover_picture_id'), 'posts', ['cover_picture_id'], unique=False)
+    op.create_index(op.f('ix_posts_page_views'), 'posts', ['page_views'], unique=False)
+    op.create_index(op.f('ix_posts_likes'), 'posts', ['likes'], unique=False)
+
+
+def downgrade():
+    op.drop_index(op.f('ix_posts_likes'), table_name='posts')
+    op.drop_index(op.f('ix_posts_page_views'), table_name='posts')
+    op.drop_index(op.f('ix_posts_cover_picture_id'), table_name='posts')
+    op.drop_column('posts', 'likes')
+    op.drop_column('posts', 'down_votes')
+    op.drop_column('posts', 'votes')
+    op.drop_column('posts', 'save_count')
+    op.drop_column('posts', 'page_views')
+    op.drop_column('posts', 'cover_picture_id')
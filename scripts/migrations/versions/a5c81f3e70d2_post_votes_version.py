@@ -0,0 +1,23 @@
+"""post votes version
+
+Revision ID: a5c81f3e70d2
+Revises: e4f8a2c6b913
+Create Date: 2026-10-18 16:41:52.118304
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a5c81f3e70d2'
+down_revision = 'e4f8a2c6b913'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.add_column('posts', sa.Column('votes_version', sa.Integer(), nullable=False, server_default='0'))
+
+
+def downgrade():
+    op.drop_column('posts', 'votes_version')
@@ -0,0 +1,33 @@
+"""ranking entries
+
+Revision ID: b7d94e2a1c36
+Revises: a5c81f3e70d2
+Create Date: 2026-10-18 17:20:31.604127
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7d94e2a1c36'
+down_revision = 'a5c81f3e70d2'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_table('ranking_entries',
+        sa.Column('post_id', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('score', sa.Numeric(precision=20, scale=7), nullable=False),
+        sa.ForeignKeyConstraint(['post_id'], ['posts.id'], onupdate='NO ACTION', ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('post_id'),
+        mysql_engine='InnoDB')
+    op.create_index('idx_score_post', 'ranking_entries', ['score', 'post_id'], unique=False)
+    # the public posts, POST_PUBLIC is 1
+    op.execute('INSERT INTO ranking_entries (post_id, score) '
+               'SELECT id, COALESCE(score, 0) FROM posts WHERE status = 1')
+
+
+def downgrade():
+    op.drop_index('idx_score_post', table_name='ranking_entries')
+    op.drop_table('ranking_entries')
@@ -0,0 +1,25 @@
+"""feed keyset indexes
+
+Revision ID: c3a1f7e2d9b4
+Revises: fd956a6ed3f1
+Create Date: 2026-10-18 09:12:40.118204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c3a1f7e2d9b4'
+down_revision = 'fd956a6ed3f1'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    op.create_index('idx_status_created', 'posts', ['status', 'created_at', 'id'], unique=False)
+    op.create_index('idx_category_status_created', 'posts', ['category_id', 'status', 'created_at', 'id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('idx_category_status_created', table_name='posts')
+    op.drop_index('idx_status_created', table_name='posts')
@@ -0,0 +1,48 @@
+"""story search index
+
+Revision ID: e4f8a2c6b913
+Revises: 7b3e9c1d5a20
+Create Date: 2026-10-18 21:03:11.502316
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e4f8a2c6b913'
+down_revision = '7b3e9c1d5a20'
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    # empty until `python command.py search rebuild` indexes the stories
+    op.create_table('search_postings',
+        sa.Column('term', sa.String(length=64, collation='utf8mb4_bin'), nullable=False),
+        sa.Column('post_id', sa.Integer(), nullable=False),
+        sa.Column('frequency', sa.Float(), nullable=False),
+        sa.ForeignKeyConstraint(['post_id'], ['posts.id'], onupdate='NO ACTION', ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('term', 'post_id'),
+        mysql_collate='utf8mb4_unicode_ci',
+        mysql_default_charset='utf8mb4',
+        mysql_engine='InnoDB')
+
+    op.create_index('ix_search_postings_post_id', 'search_postings', ['post_id'], unique=False)
+
+    op.create_table('search_documents',
+        sa.Column('post_id', sa.Integer(), autoincrement=False, nullable=False),
+        sa.Column('lang', sa.String(length=4), nullable=False),
+        sa.Column('length', sa.Float(), nullable=False),
+        sa.Column('indexed_at', sa.DateTime(), nullable=True),
+        sa.ForeignKeyConstraint(['post_id'], ['posts.id'], onupdate='NO ACTION', ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('post_id'),
+        mysql_collate='utf8mb4_unicode_ci',
+        mysql_default_charset='utf8mb4',
+        mysql_engine='InnoDB')
+
+    op.create_index('ix_search_documents_lang', 'search_documents', ['lang'], unique=False)
+
+
+def downgrade():
+    op.drop_table('search_documents')
+    op.drop_table('search_postings')
@@ -0,0 +1,38 @@
+# -*- coding: utf8 -*-
+
+import click
+from app import app
+
+
+@click.group()
+def cli():
+    pass
+
+
+@cli.command()
+@click.option('--batch', default=500, help='number of posts per transaction')
+def excerpts(batch):
+    """Compute the summary and excerpt of the posts missing them."""
+    from sqlalchemy import or_
+    from app.models import Post
+    from app import sa
+
+    pending = or_(Post._summary.is_(None), Post._excerpt.is_(None))
+    total = 0
+
+    while True:
+        posts = Post.query.filter(pending).order_by(Post.id).limit(batch).all()
+
+        if not posts:
+            break
+
+        for post in posts:
+            post._summary = Post.make_excerpt(post.body, Post.SUMMARY_LENGTH)
+            post._excerpt = Post.make_excerpt(post.extra_body, Post.EXCERPT_LENGTH)
+            sa.session.add(post)
+
+        sa.session.commit()
+        total += len(posts)
+        click.echo('%s posts updated...' % total)
+
+    click.echo('Excerpts completed, %s posts updated.' % total)
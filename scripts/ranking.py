@@ -0,0 +1,40 @@
+# -*- coding: utf8 -*-
+
+import click
+from app import app
+
+
+@click.group()
+def cli():
+    pass
+
+
+@cli.command()
+def rebuild():
+    """Rebuild the ranking index from the database."""
+    from app.models import Ranking
+
+    count = Ranking.rebuild()
+    click.echo('Ranking index rebuilt with %s posts.' % count)
+
+
+@cli.command()
+@click.option('--fix', is_flag=True, help='rebuild the index when it is not consistent')
+def check(fix):
+    """Compare the ranking index against the sql ordering."""
+    from app.models import Ranking
+
+    mismatches = Ranking.check()
+
+    if not mismatches:
+        click.echo('Ranking index is consistent.')
+        return
+
+    for position, index_id, sql_id in mismatches:
+        click.echo('#%s index: %s sql: %s' % (position + 1, index_id, sql_id))
+
+    click.echo('%s mismatches found.' % len(mismatches))
+
+    if fix:
+        count = Ranking.rebuild()
+        click.echo('Ranking index rebuilt with %s posts.' % count)
@@ -1,2 +1,3 @@
 find $PWD -name \*.pyc -delete
+python command.py cache bump widgets
 python run.py
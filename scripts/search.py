@@ -0,0 +1,34 @@
+# -*- coding: utf8 -*-
+
+import click
+from app import app
+
+
+@click.group()
+def cli():
+    pass
+
+
+@cli.command()
+@click.option('--batch', default=200, help='number of posts per transaction')
+def rebuild(batch):
+    """Index every public story again."""
+    from app.models import StorySearch
+
+    total = StorySearch.rebuild(batch=batch)
+    click.echo('Search index rebuilt, %s stories indexed.' % total)
+
+
+@cli.command()
+@click.argument('keyword')
+@click.option('--lang', default='en', help='language analyzing the keyword')
+@click.option('--limit', default=10, help='number of stories to show')
+def query(keyword, lang, limit):
+    """Show the stories matching the keyword, best ranked first."""
+    from app.models import StorySearch
+
+    posts, total = StorySearch.search(keyword.decode('utf-8'), lang=lang, limit=limit)
+
+    click.echo('%s stories found.' % total)
+    for post in posts:
+        click.echo(u'%8s  %s' % (post.id, post.title))
@@ -0,0 +1,32 @@
+# -*- coding: utf8 -*-
+
+import click
+from app import app
+
+
+@click.group()
+def cli():
+    pass
+
+
+@cli.command()
+@click.option('--workers', default=2, help='number of Socket.IO processes')
+@click.option('--host', default='0.0.0.0', help='address to listen on')
+@click.option('--port', default=5000, help='port of the first worker, the next ones follow')
+def serve(workers, host, port):
+    """Run several Socket.IO workers sharing their events.
+
+    The events go through SOCKET_IO_MESSAGE_QUEUE, the load balancer in
+    front of the workers has to keep the sessions sticky, see README.
+    """
+    from app.events.workers import start_workers
+
+    try:
+        processes = start_workers(workers, host, port)
+    except ValueError as e:
+        raise click.ClickException(str(e))
+
+    click.echo('%s workers listening on %s:%s-%s.' % (workers, host, port, port + workers - 1))
+
+    for process in processes:
+        process.wait()
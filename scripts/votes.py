@@ -0,0 +1,28 @@
+# -*- coding: utf8 -*-
+
+import click
+from app import app
+
+
+@click.group()
+def cli():
+    pass
+
+
+@cli.command()
+@click.option('--fix', is_flag=True, help='set the likes back to the count of votes')
+@click.option('--batch', default=1000, help='number of posts per query')
+def reconcile(fix, batch):
+    """Compare the likes of the posts with the count of their votes."""
+    from app.models import Vote
+
+    mismatches = Vote.reconcile(fix=fix, batch=batch)
+
+    if not mismatches:
+        click.echo('Likes are consistent with the votes.')
+        return
+
+    for post_id, likes, votes in mismatches:
+        click.echo('post %s likes: %s votes: %s' % (post_id, likes, votes))
+
+    click.echo('%s mismatches found%s.' % (len(mismatches), ', fixed' if fix else ''))
@@ -0,0 +1,41 @@
+#!/usr/bin/env python
+
+# -*- coding: utf8 -*-
+"""Runs one Socket.IO worker, see `python command.py sockets serve`.
+
+    python socketio_worker.py [port] [host]
+
+The port and host default to SOCKET_IO_PORT and SOCKET_IO_HOST.
+"""
+import os
+import sys
+
+
+def patch():
+    """Makes the standard library cooperative, before the app is imported.
+
+    The message queue client blocks on its connection, with the sockets
+    served by gevent it has to be green to leave the other sockets running.
+    Patching once the app and its clients are loaded is too late.
+    """
+    try:
+        from gevent import monkey
+    except ImportError:
+        return
+
+    monkey.patch_all()
+
+
+def main(argv):
+    patch()
+
+    from app import app, socketio
+
+    port = int(argv[0] if len(argv) > 0 else os.environ.get('SOCKET_IO_PORT', 5000))
+    host = argv[1] if len(argv) > 1 else os.environ.get('SOCKET_IO_HOST', '0.0.0.0')
+
+    socketio.run(app, host=host, port=port, use_reloader=False)
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
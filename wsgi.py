@@ -1,4 +1,12 @@
 #!/usr/bin/python
 
+import config
+
+# the workers share their events through the message queue, the standard
+# library has to be patched before the app opens its connection
+if getattr(config, 'SOCKET_IO_MESSAGE_QUEUE', None):
+    import socketio_worker
+    socketio_worker.patch()
+
 from app import app, socketio
 socketio.run(app, host='0.0.0.0')